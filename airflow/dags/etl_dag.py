@@ -8,6 +8,9 @@ from datetime import datetime, timedelta
 # ── Imports ───────────────────────────────────────────────────────
 
 from src.utils.watermark import create_watermark_table
+from src.utils.manifest import create_manifest_table
+from src.utils.schema_registry import create_schema_registry_table
+from src.utils.text_cleaning import create_clean_cache_table
 
 from src.ingestion.data_xlsx_to_csv import run as run_xlsx_to_csv
 from src.ingestion.creating_database import run as run_create_database
@@ -52,6 +55,21 @@ with DAG(
         python_callable=create_watermark_table
     )
 
+    task_init_manifest = PythonOperator(
+        task_id="init_manifest",
+        python_callable=create_manifest_table
+    )
+
+    task_init_schema_registry = PythonOperator(
+        task_id="init_schema_registry",
+        python_callable=create_schema_registry_table
+    )
+
+    task_init_clean_cache = PythonOperator(
+        task_id="init_clean_cache",
+        python_callable=create_clean_cache_table
+    )
+
     # ── Ingestion ─────────────────────────────────────────────────
 
     task_xlsx_to_csv = PythonOperator(
@@ -112,11 +130,17 @@ with DAG(
 
     # ── Dependencies ──────────────────────────────────────────────
     #
+    # create_database
+    #       ↓
     # init_watermarks
     #       ↓
-    # xlsx_to_csv
+    # init_manifest
     #       ↓
-    # create_database
+    # init_schema_registry
+    #       ↓
+    # init_clean_cache
+    #       ↓
+    # xlsx_to_csv
     #       ↓
     # load_bronze
     #       ↓
@@ -128,9 +152,12 @@ with DAG(
     #                                       ↓
     #                                  rfm_scoring → cltv
 
-    task_init_watermarks >> task_xlsx_to_csv
-    task_xlsx_to_csv     >> task_create_database
-    task_create_database >> task_bronze
+    task_create_database >> task_init_watermarks
+    task_init_watermarks >> task_init_manifest
+    task_init_manifest   >> task_init_schema_registry
+    task_init_schema_registry >> task_init_clean_cache
+    task_init_clean_cache >> task_xlsx_to_csv
+    task_xlsx_to_csv     >> task_bronze
     task_bronze          >> task_silver
     task_silver          >> task_country_mapping
     task_country_mapping >> task_exchange_rate
@@ -0,0 +1,127 @@
+"""
+=============================================================
+Benchmark: fx_create_table default path vs bulk-load path
+=============================================================
+Script purpose:
+    Measures the time to write a synthetic GOLD_FACT_SALES-like table (1M rows by default) with fx_create_table,
+    in a temporary database file:
+        - "to_sql": the default path (pandas to_sql, default PRAGMAs), then the same indexes created afterwards
+        - "bulk": bulk=True (tuned PRAGMAs, prepared multi-row inserts, one transaction), indexes built after the data
+    The optional bulk PRAGMAs are read from BULK_CACHE_SIZE_KB and BULK_TEMP_STORE, so their effect can be measured:
+        BULK_CACHE_SIZE_KB=262144 BULK_TEMP_STORE=MEMORY python -m src.benchmarks.bench_create_table
+
+Process:
+    01. Build a synthetic fact table (invoice, stockcode, quantity, price, customer, dates, ids, revenue)
+    02. For each path, create a fresh database, write the table and its indexes, commit, and time it
+    03. Check both tables hold the same rows, then print the timings
+    End of process
+
+List of functions used:
+    - fx_build_fact_sales : build the synthetic fact table
+    - fx_time_path : write the table in a fresh database with one path and return the elapsed time
+
+Potential improvements:
+    - Not determined yet
+
+WARNING:
+    Needs about 1 GB of memory and disk for 1M rows.
+
+Exemple of use:
+    python -m src.benchmarks.bench_create_table --rows 1000000
+"""
+
+# 1. Import libraries ----
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.utils.create_table import fx_create_table, BULK_CACHE_SIZE_KB, BULK_TEMP_STORE
+
+DTYPE_MAPPING = {
+    "INVOICE":      "TEXT",
+    "STOCKCODE":    "TEXT",
+    "QUANTITY":     "INTEGER",
+    "PRICE":        "REAL",
+    "CUSTOMER_ID":  "TEXT",
+    "INVOICE_DATE": "TEXT",
+    "INVOICE_TIME": "TEXT",
+    "INVOICE_TYPE": "TEXT",
+    "COUNTRY_ID":   "INTEGER",
+    "PRODUCT_ID":   "INTEGER",
+    "REVENUE":      "REAL"
+}
+INDEXES = ["INVOICE_DATE", "CUSTOMER_ID", ("PRODUCT_ID", "COUNTRY_ID")]
+
+
+# 2. Fx build fact sales ----
+def fx_build_fact_sales(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp("2009-12-01") + pd.to_timedelta(rng.integers(0, 740 * 24 * 60, rows), unit="min")
+    df = pd.DataFrame({
+        "INVOICE":      (489434 + rng.integers(0, 50_000, rows)).astype(str),
+        "STOCKCODE":    (10_000 + rng.integers(0, 5_000, rows)).astype(str),
+        "QUANTITY":     rng.integers(-5, 50, rows),
+        "PRICE":        rng.integers(10, 5_000, rows) / 100,
+        "CUSTOMER_ID":  (12_000 + rng.integers(0, 6_000, rows)).astype(str),
+        "INVOICE_DATE": dates.strftime("%Y-%m-%d"),
+        "INVOICE_TIME": dates.strftime("%H:%M:%S"),
+        "INVOICE_TYPE": rng.choice(["SALE", "CANCELLATION", "ADJUSTMENT"], rows, p=[0.97, 0.02, 0.01]),
+        "COUNTRY_ID":   rng.integers(0, 10_000, rows),
+        "PRODUCT_ID":   rng.integers(0, 100_000, rows),
+    })
+    df["REVENUE"] = df["QUANTITY"] * df["PRICE"]
+    return df
+
+
+# 3. Fx time path ----
+def fx_time_path(df: pd.DataFrame, db_path: str, bulk: bool) -> float:
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    start = time.perf_counter()
+    with conn:
+        if bulk:
+            fx_create_table("GOLD", "FACT_SALES", df, DTYPE_MAPPING, conn, bulk=True, indexes=INDEXES)
+        else:
+            fx_create_table("GOLD", "FACT_SALES", df, DTYPE_MAPPING, conn, bulk=False)
+            for index_cols in INDEXES:
+                index_cols = [index_cols] if isinstance(index_cols, str) else list(index_cols)
+                conn.execute(
+                    f"CREATE INDEX IDX_GOLD_FACT_SALES_{'_'.join(index_cols)} ON GOLD_FACT_SALES ({', '.join(index_cols)})"
+                )
+    elapsed = time.perf_counter() - start
+    conn.close()
+    return elapsed
+
+
+# 4. Run ----
+def run(rows: int = 1_000_000):
+    print(f"\n########### bench_create_table | {rows:,} rows ###########")
+    print(f"Bulk PRAGMAs: cache_size={BULK_CACHE_SIZE_KB or 'default'} KB | temp_store={BULK_TEMP_STORE}")
+    df = fx_build_fact_sales(rows)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        timings = {}
+        for name, bulk in (("to_sql", False), ("bulk", True)):
+            timings[name] = fx_time_path(df, os.path.join(tmp, f"{name}.db"), bulk)
+
+        query = "SELECT COUNT(*), SUM(QUANTITY), ROUND(SUM(REVENUE), 2), MAX(INVOICE_DATE) FROM GOLD_FACT_SALES"
+        results = [sqlite3.connect(os.path.join(tmp, f"{name}.db")).execute(query).fetchone() for name in timings]
+        assert results[0] == results[1], f"Tables differ: {results}"
+
+    print("=" * 50)
+    for name, elapsed in timings.items():
+        print(f"  {name:8} {elapsed:8.2f}s  ({rows / elapsed:,.0f} rows/s)")
+    print(f"  Speed-up: x{timings['to_sql'] / timings['bulk']:.2f}")
+    print("=" * 50)
+    return timings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark fx_create_table write paths")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    run(parser.parse_args().rows)
@@ -0,0 +1,124 @@
+"""
+=============================================================
+Benchmark: object strings vs Arrow strings and categoricals
+=============================================================
+Script purpose:
+    Measures the memory and the speed of the silver/gold dataframes (1M rows by default) with text held
+    as Python objects versus the dtypes of src/utils/dtypes.py (Arrow strings, categoricals for low-cardinality columns):
+        - memory: DataFrame.memory_usage(deep=True)
+        - groupby: the RFM aggregation per CUSTOMER_ID (fx_prepare_sales -> fx_build_rfm)
+        - merge: the product join of fx_build_fact_sales on (STOCKCODE, DESCRIPTION)
+
+Process:
+    01. Build a synthetic silver sales table and its product mapping, as read from SQLite (object strings)
+    02. Convert a copy with fx_optimize_dtypes
+    03. Time the groupby and the merge on both, check the results match, then print the figures
+    End of process
+
+List of functions used:
+    - fx_build_sales : build the synthetic sales table and product mapping
+    - fx_time : run a function a few times and return the best time and the result
+    - fx_groupby / fx_merge : the timed operations
+
+Potential improvements:
+    - Not determined yet
+
+WARNING:
+    Needs about 1 GB of memory for 1M rows.
+
+Exemple of use:
+    python -m src.benchmarks.bench_dtypes --rows 1000000
+"""
+
+# 1. Import libraries ----
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.utils.dtypes import fx_optimize_dtypes
+
+
+# 2. Fx build sales ----
+def fx_build_sales(rows: int, seed: int = 0) -> tuple:
+    rng = np.random.default_rng(seed)
+    stockcodes = np.array([f"{code}{suffix}" for code, suffix in zip(rng.integers(10_000, 90_000, 4_000), rng.choice(["", "A", "B"], 4_000))])
+    descriptions = np.array([f"PRODUCT_{i}_{word}" for i, word in enumerate(rng.choice(["HEART", "LANTERN", "MUG", "BAG"], 4_000))])
+    product = rng.integers(0, 4_000, rows)
+    countries = np.array([f"COUNTRY_{i}" for i in range(40)])
+    df_sales = pd.DataFrame({
+        "INVOICE":      (489434 + rng.integers(0, 50_000, rows)).astype(str).astype(object),
+        "STOCKCODE":    stockcodes[product].astype(object),
+        "DESCRIPTION":  descriptions[product].astype(object),
+        "QUANTITY":     rng.integers(1, 50, rows),
+        "PRICE":        rng.integers(10, 5_000, rows) / 100,
+        "CUSTOMER_ID":  (12_000 + rng.integers(0, 6_000, rows)).astype(str).astype(object),
+        "COUNTRY":      countries[rng.integers(0, 40, rows)].astype(object),
+        "INVOICE_DATE": pd.Series(pd.Timestamp("2009-12-01") + pd.to_timedelta(rng.integers(0, 740, rows), unit="D")).dt.strftime("%Y-%m-%d"),
+        "INVOICE_TYPE": rng.choice(["SALE", "RETURN"], rows, p=[0.97, 0.03]).astype(object),
+    })
+    df_sales["REVENUE"] = df_sales["QUANTITY"] * df_sales["PRICE"]
+    df_product = pd.DataFrame({
+        "STOCKCODE": stockcodes.astype(object), "DESCRIPTION_RAW": descriptions.astype(object), "PRODUCT_ID": np.arange(4_000)
+    })
+    return df_sales, df_product
+
+
+# 3. Fx time ----
+def fx_time(fx, repeat: int = 3):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fx()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+## Fx groupby (RFM aggregation) ----
+def fx_groupby(df):
+    return df.groupby("CUSTOMER_ID").agg(
+        FREQUENCY=("INVOICE", "nunique"), SOLD_QUANTITY=("QUANTITY", "sum"), TOTAL_REVENUE=("REVENUE", "sum")
+    )
+
+
+## Fx merge (product join) ----
+def fx_merge(df, df_product):
+    return pd.merge(df, df_product, left_on=["STOCKCODE", "DESCRIPTION"], right_on=["STOCKCODE", "DESCRIPTION_RAW"], how="left")
+
+
+# 4. Run ----
+def run(rows: int = 1_000_000):
+    print(f"\n########### bench_dtypes | {rows:,} rows ###########")
+    df_sales, df_product = fx_build_sales(rows)
+    frames = {
+        "object": (df_sales, df_product),
+        "arrow": (fx_optimize_dtypes(df_sales.copy()), fx_optimize_dtypes(df_product.copy()))
+    }
+
+    figures = {}
+    for name, (df, df_prod) in frames.items():
+        memory = df.memory_usage(deep=True).sum() / 1024 ** 2
+        groupby_time, df_group = fx_time(lambda: fx_groupby(df))
+        merge_time, df_merged = fx_time(lambda: fx_merge(df, df_prod))
+        figures[name] = (memory, groupby_time, merge_time, df_group, df_merged)
+
+    df_group_object, df_group_arrow = figures["object"][3], figures["arrow"][3]
+    assert df_group_object.reset_index().astype(str).equals(df_group_arrow.reset_index().astype(str)), "groupby results differ"
+    assert figures["object"][4]["PRODUCT_ID"].equals(figures["arrow"][4]["PRODUCT_ID"]), "merge results differ"
+
+    print("=" * 60)
+    print(f"  {'dtypes':8} {'memory':>10} {'groupby':>10} {'merge':>10}")
+    for name, (memory, groupby_time, merge_time, _, _) in figures.items():
+        print(f"  {name:8} {memory:8.0f}MB {groupby_time:9.3f}s {merge_time:9.3f}s")
+    print(f"  Memory: /{figures['object'][0] / figures['arrow'][0]:.1f} | "
+          f"groupby: x{figures['object'][1] / figures['arrow'][1]:.1f} | "
+          f"merge: x{figures['object'][2] / figures['arrow'][2]:.1f}")
+    print("=" * 60)
+    return figures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark object vs Arrow/categorical dtypes")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    run(parser.parse_args().rows)
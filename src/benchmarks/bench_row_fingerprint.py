@@ -0,0 +1,92 @@
+"""
+=============================================================
+Benchmark: row fingerprint across chunk dtypes
+=============================================================
+Script purpose:
+    Measures fx_add_row_fingerprint on a synthetic cleaned silver sales table (1M rows by default),
+    and checks a line gets the same ROW_FINGERPRINT whatever the dtypes of the chunk it comes from:
+        - numbers: CUSTOMER_ID and QUANTITY as float64 (12345.0), PRICE as float64
+        - text: the same values as text ("12345"), as in a chunk where CUSTOMER_ID holds an UNKNOWN
+
+Process:
+    01. Build a synthetic table with numeric CUSTOMER_ID, QUANTITY and PRICE
+    02. Build a copy of it with these columns held as text
+    03. Fingerprint both and time it, check the fingerprints are identical, then print the timings
+    End of process
+
+List of functions used:
+    - fx_build_sales : build the synthetic table
+    - fx_as_text : the same table with the numeric columns held as text
+
+Potential improvements:
+    - Not determined yet
+
+WARNING:
+    Not determined yet
+
+Exemple of use:
+    python -m src.benchmarks.bench_row_fingerprint --rows 1000000
+"""
+
+# 1. Import libraries ----
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.silver.script_layer_silver import FINGERPRINT_COLUMN, fx_add_row_fingerprint
+
+
+# 2. Fx build sales ----
+def fx_build_sales(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    customer_id = (12346 + rng.integers(0, 6_000, rows)).astype(float)
+    customer_id[rng.random(rows) < 0.01] = np.nan
+    return pd.DataFrame({
+        "INVOICE": (489434 + rng.integers(0, 50_000, rows)).astype(str),
+        "STOCKCODE": rng.choice(["85123A", "22423", "POST", "21232"], rows),
+        "DESCRIPTION": rng.choice(["WHITE_HANGING_HEART", "REGENCY_CAKESTAND", "POSTAGE"], rows),
+        "QUANTITY": rng.integers(-5, 50, rows).astype(float),
+        "PRICE": rng.integers(1, 2_000, rows) / 100,
+        "CUSTOMER_ID": customer_id,
+        "COUNTRY": rng.choice(["UNITED_KINGDOM", "FRANCE", "UNKNOWN"], rows),
+        "INVOICE_TS": 1_259_625_600 + rng.integers(0, 63_000_000, rows),
+    })
+
+
+# 3. Fx as text ----
+def fx_as_text(df):
+    """Same lines, numeric columns held as text like in a chunk read with mixed values ("12345", "2.55")."""
+    df = df.copy()
+    df["CUSTOMER_ID"] = df["CUSTOMER_ID"].map(lambda v: None if pd.isna(v) else str(int(v)))
+    df["QUANTITY"] = df["QUANTITY"].astype(int).astype(str)
+    df["PRICE"] = df["PRICE"].astype(str)
+    return df
+
+
+# 4. Run ----
+def run(rows: int = 1_000_000):
+    print(f"\n########### bench_row_fingerprint | {rows:,} rows ###########")
+    df = fx_build_sales(rows)
+
+    timings, fingerprints = {}, {}
+    for name, df_run in (("numeric", df.copy()), ("text", fx_as_text(df))):
+        start = time.perf_counter()
+        df_run = fx_add_row_fingerprint(df_run)
+        timings[name] = time.perf_counter() - start
+        fingerprints[name] = df_run[FINGERPRINT_COLUMN]
+
+    assert fingerprints["numeric"].equals(fingerprints["text"]), "fingerprints depend on the column dtypes"
+
+    print("=" * 50)
+    for name, elapsed in timings.items():
+        print(f"  {name:10} {elapsed:8.3f}s  ({rows / elapsed:,.0f} rows/s)")
+    print("=" * 50)
+    return timings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the row fingerprint and check it does not depend on dtypes")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    run(parser.parse_args().rows)
@@ -18,12 +18,14 @@ Layer purpose:
 
 Process:
     01. Connect to the database located ../data/database (it should be named DATAWAREHOUSE_ONLINE_RETAIL_II)
-    02. Fetch the csv files located in ../data/csv.
+    02. Fetch the csv files located in ../data/csv (or the parquet files in ../data/parquet if INTERMEDIATE_FORMAT is "parquet").
+        With BRONZE_SOURCE="xlsx", the sheets are read straight from the workbooks in ../data/raw instead (see Direct xlsx mode).
     03. Open a transaction with the DB.
         - The next step must fully succeed for the data to be committed. 
         - Otherwise, if at least one fail, everything done for previous files is rolled back
-    04. For each file in the folder:
-        - Create dataframe (df)
+        - The tables, the file manifest and the RFM mapping (with its watermark) commit together at the end of the run
+    04. For each file in the folder whose content changed (content-hash manifest, see src/utils/manifest.py):
+        - Create dataframe (df). Parquet files are read with their own schema, only the sheet columns are projected
         - Clean df columns name 
         - Find the type of data in each column and create a dictionnary from it
         - Create the table name with BRONZE_{file_name}
@@ -31,7 +33,8 @@ Process:
         - Concatenate SQL statement (table name, col names, col type)
         - Create the table with the SQL statement
         - Insert data from the file to the DB table
-        - Display how many rows have been inserted
+        - Display how many rows have been inserted, and the load speed (rows per second)
+        With BRONZE_LOAD_MODE="chunked", the file is streamed by batches of BRONZE_CHUNK_SIZE rows instead (see Chunked load mode).
     05. Close connection
     End of process
 
@@ -39,8 +42,58 @@ List of functions used:
     - fx_connect_db : connect to the database, imported from connection_to_database.py
     - fx_retrieve_csv_files : find the in csv files in ../data/csv
     - fx_process_csv_to_bronze : use other functions to import CSV to DF, clean cols, define dtypes, create table name, drop/create table, import data from csv to table
+        - fx_parse_file : read the file in a df (with the registered dtypes if any) and clean cols
+        - fx_registered_dtypes : explicit parse dtype of each csv column from the registered schema
+        - fx_write_file_to_bronze : define dtypes, create table name, drop/create table, import data from the df to the table
+        - fx_frame_schema : observed schema (SQL type and pandas dtype) of each df column
+        - fx_apply_schema_registry : register the schema of a table, or flag its drift and keep the registered types
+        - fx_read_parquet : read a typed parquet file with column projection
         - fx_clean_col : transform df column name with upper + letters, numbers and _ only)
         - fx_map_dtype : from a provided df column, return the dtype of the data
+        - fx_bronze_indexes : columns of INDEXED_COLUMNS to index in the table (INVOICEDATE)
+    - fx_iter_parsed_files : parse the files over a process pool, yield each one as soon as it is ready
+    - fx_process_file_chunked : load a csv or parquet file batch by batch
+        - fx_scan_csv_dtypes : first pass on the csv chunks to widen each column type
+        - fx_parquet_dtypes : column types from the parquet schema
+        - fx_iter_file_chunks : yield the file as dataframes of BRONZE_CHUNK_SIZE rows
+        - fx_cast_chunk : cast a chunk to the registered dtypes, flag the columns that do not fit
+    - fx_load_xlsx_files_to_bronze : load the changed sheets of the raw workbooks, without intermediate file
+        - fx_process_sheet_to_bronze : profile a sheet, then insert its rows by chunks in the BRONZE table
+        - fx_iter_bronze_chunks : yield the sheet rows as dataframes of XLSX_CHUNK_SIZE rows
+        - fx_bronze_value : convert a cell value like the csv round trip would
+
+Append mode:
+    Set BRONZE_WRITE_MODE="append" to follow the append-only model: the tables are no longer dropped,
+    each load of a file or sheet is added as a new batch (INGEST_BATCH_ID, INGESTED_AT), so a load only costs
+    the new data and the history is kept. The {table}_LATEST view returns the last batch, through an index on INGEST_BATCH_ID.
+    Each batch commits in the same transaction as the manifest entry of its file, so a rerun after a crash
+    reloads only what was not committed and never appends the same file twice.
+    The RFM mapping is a business input, always replaced.
+
+Schema registry:
+    The first load of a table registers its schema in _schema_registry (src/utils/schema_registry.py).
+    Later loads parse the csv columns with these explicit dtypes (no inference, nullable integers so CUSTOMER_ID
+    does not flip between INTEGER and REAL with nulls) and create the table with the registered types.
+    A file that does not fit its registered types anymore is flagged in _schema_drift, the table definition does not change.
+    To accept a new schema, delete the source row from _schema_registry.
+
+Parallel parsing:
+    Set BRONZE_PARSE_WORKERS > 1 to parse and type several files at once in worker processes,
+    while the main process, the only SQLite writer, inserts each parsed file as soon as it is ready, in the same transaction.
+    Parsing (CPU) and inserts (I/O) then overlap. It applies to the full load mode (not to BRONZE_LOAD_MODE="chunked").
+
+Chunked load mode:
+    Set BRONZE_LOAD_MODE="chunked" (and BRONZE_CHUNK_SIZE, 100000 rows by default) to keep the memory flat whatever the file size.
+    A csv file with a registered schema is read once, each chunk cast to the registered dtypes (see Schema registry).
+    On its first load, it is read twice: pass 1 widens the type of each column across chunks (INTEGER < REAL < TEXT),
+    pass 2 inserts each batch with executemany on a prepared statement, in the same transaction as the rest of the run.
+    Tables and values are the same as with the full load.
+
+Direct xlsx mode:
+    Set BRONZE_SOURCE="xlsx" to skip the intermediate csv/parquet files: each raw row is read once from the workbook
+    and inserted in batches, instead of xlsx parse -> csv write -> csv read -> dataframe -> insert.
+    The tables, columns, types and values are the same as with the csv files.
+    The xlsx_to_csv task then only writes files if XLSX_AUDIT_FILES=1 (audit copy of the sheets).
 
 Potential improvements: 
     - Not determined yet
@@ -57,16 +110,54 @@ print(f"\n########### Import librairies ###########")
 # pip install openpyxl
 import os
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from datetime import datetime, timezone
 
+from src.ingestion.data_xlsx_to_csv import (
+    RAW_PATH, CHUNK_SIZE, fx_build_output_name, fx_profile_sheet,
+    fx_resolve_column_kind, fx_format_value, fx_iter_row_chunks
+)
 from src.utils.connecting_to_database import fx_connect_db
 from src.utils.create_table import fx_create_table
+from src.utils.manifest import detect_changes, set_manifest_entries
+from src.utils.schema_registry import get_schema, set_schema, record_drift, compare_schema, parse_dtypes
+from src.utils.db import transaction
 from src.utils.watermark import get_watermark, set_watermark
 
 CSV_PATH = "/opt/airflow/data/csv"
+PARQUET_PATH = "/opt/airflow/data/parquet"
 RFM_PATH = "/opt/airflow/data/business_inputs/rfm/RFM_SCORING.xlsx"
 
+# Intermediate format written by the ingestion ("csv" or "parquet")
+INTERMEDIATE_FORMAT = os.environ.get("INTERMEDIATE_FORMAT", "csv")
+SOURCE_PATH = PARQUET_PATH if INTERMEDIATE_FORMAT == "parquet" else CSV_PATH
+
+# Where the bronze tables are loaded from: "files" (csv/parquet written by the ingestion) or "xlsx" (raw workbooks, single pass)
+BRONZE_SOURCE = os.environ.get("BRONZE_SOURCE", "files")
+
+# "full": read each file in one dataframe | "chunked": stream it by batches of BRONZE_CHUNK_SIZE rows
+BRONZE_LOAD_MODE = os.environ.get("BRONZE_LOAD_MODE", "full")
+BRONZE_CHUNK_SIZE = int(os.environ.get("BRONZE_CHUNK_SIZE", "100000"))
+
+# "replace": each load rewrites the table | "append": each load is a new batch (INGEST_BATCH_ID), read through {table}_LATEST
+BRONZE_WRITE_MODE = os.environ.get("BRONZE_WRITE_MODE", "replace")
+
+# Number of processes parsing the files while the main process writes them (1 = parse and write one after another)
+BRONZE_PARSE_WORKERS = int(os.environ.get("BRONZE_PARSE_WORKERS", "1"))
+
+# Order used to widen a column type across chunks
+SQL_TYPE_RANK = {"INTEGER": 0, "REAL": 1, "TEXT": 2}
+
+# SQL type of each column kind found by the streaming profile (same types as the csv path)
+KIND_SQL_TYPES = {"int": "INTEGER", "float": "REAL", "empty": "REAL"}
+
+# Columns indexed in the bronze tables that have them (silver reads its incremental slice and its months through INVOICEDATE)
+INDEXED_COLUMNS = ("INVOICEDATE",)
+
 
 
 # 3. Define common functions ----
@@ -86,14 +177,209 @@ def fx_map_dtype(dtype):
     return "TEXT"
 
 
-## Create fx_process_csv_to_bronze function ----
-def fx_process_csv_to_bronze(csv_file, conn):
-    file_path = os.path.join(CSV_PATH, csv_file)
-    df = pd.read_csv(file_path)
+## Create fx_read_parquet function ----
+def fx_read_parquet(file_path):
+    """Reads a typed parquet file: only the sheet columns are projected (no index columns),
+    and the types come from the file schema (nullable integers, strings, timestamps)."""
+    schema = pq.read_schema(file_path)
+    columns = [name for name in schema.names if not name.startswith("__index_level_")]
+    return pd.read_parquet(file_path, columns=columns, dtype_backend="numpy_nullable")
+
+
+## Create fx_scan_csv_dtypes function ----
+def fx_scan_csv_dtypes(file_path, chunk_size=BRONZE_CHUNK_SIZE):
+    """First pass over a CSV by chunks: widens each column type (INTEGER < REAL < TEXT) to the type a full read would give.
+    Returns the SQL type mapping and the columns that must be read as text (raw strings in a full read)."""
+    dtype_mapping = {}
+    text_cols = set()
+    for chunk in pd.read_csv(file_path, chunksize=chunk_size):
+        for col in chunk.columns:
+            sql_type = fx_map_dtype(chunk[col].dtype)
+            if chunk[col].dtype == object:
+                text_cols.add(col)
+            if col not in dtype_mapping or SQL_TYPE_RANK[sql_type] > SQL_TYPE_RANK[dtype_mapping[col]]:
+                dtype_mapping[col] = sql_type
+    if not dtype_mapping:
+        dtype_mapping = {col: "TEXT" for col in pd.read_csv(file_path, nrows=0).columns}
+    return dtype_mapping, text_cols
+
+
+## Create fx_parquet_dtypes function ----
+def fx_parquet_dtypes(file_path):
+    """SQL type mapping from the parquet schema (same types as fx_map_dtype on the typed dataframe)."""
+    schema = pq.read_schema(file_path)
+    dtype_mapping = {}
+    for field in schema:
+        if field.name.startswith("__index_level_"):
+            continue
+        if pa.types.is_integer(field.type):
+            dtype_mapping[field.name] = "INTEGER"
+        elif pa.types.is_floating(field.type):
+            dtype_mapping[field.name] = "REAL"
+        else:
+            dtype_mapping[field.name] = "TEXT"
+    return dtype_mapping
+
+
+## Create fx_iter_file_chunks function ----
+def fx_iter_file_chunks(file_path, columns, text_cols=(), chunk_size=BRONZE_CHUNK_SIZE):
+    """Yields the file content as dataframes of chunk_size rows, with cleaned column names."""
+    if file_path.endswith(".parquet"):
+        batches = pq.ParquetFile(file_path).iter_batches(batch_size=chunk_size, columns=columns)
+        chunks = (batch.to_pandas() for batch in batches)
+    else:
+        chunks = pd.read_csv(file_path, chunksize=chunk_size, dtype={col: str for col in text_cols})
+    for chunk in chunks:
+        chunk.columns = [fx_clean_col(col) for col in chunk.columns]
+        yield chunk
+
+
+## Create fx_cast_chunk function ----
+def fx_cast_chunk(chunk, cast_dtypes, registered, drifted):
+    """Casts the columns of a chunk to their registered dtypes, like fx_parse_file does for a whole file.
+    A column whose values do not fit anymore keeps its inferred values and is returned as a drift
+    (column, registered_type, observed_type), once per column (drifted holds the columns already flagged)."""
+    drifts = []
+    for col, dtype in cast_dtypes.items():
+        if col not in chunk.columns or col in drifted:
+            continue
+        try:
+            chunk[col] = chunk[col].astype(dtype)
+        except (ValueError, TypeError):
+            drifted.add(col)
+            drifts.append((col, registered[col]["sql_type"], fx_map_dtype(chunk[col].dtype)))
+    return chunk, drifts
+
+
+## Create fx_bronze_indexes function ----
+def fx_bronze_indexes(dtype_mapping):
+    """Returns the INDEXED_COLUMNS present in a bronze table, built by fx_create_table once the rows are in."""
+    return [col for col in INDEXED_COLUMNS if col in dtype_mapping]
+
+
+## Create fx_process_file_chunked function ----
+def fx_process_file_chunked(csv_file, conn):
+    """Chunked mode: the file is never fully in memory, each batch is bulk-inserted with a prepared statement.
+    A csv whose columns are all registered is read once: its text columns are parsed as text and the other columns
+    are cast to their registered dtypes chunk by chunk (fx_cast_chunk), a chunk that does not fit is flagged as drift.
+    Otherwise (first load, new or missing columns) a first pass widens each column type (fx_scan_csv_dtypes)."""
+    file_path = os.path.join(SOURCE_PATH, csv_file)
+    table = os.path.splitext(csv_file)[0].upper()
+    source = f"BRONZE_{table}"
+    registered = None if csv_file.endswith(".parquet") else get_schema(source, conn)
+    header = pd.read_csv(file_path, nrows=0).columns if registered else []
+
+    cast_dtypes = {}
+    if registered and {fx_clean_col(col) for col in header} == set(registered):
+        raw_dtypes = fx_registered_dtypes(file_path, registered)
+        raw_mapping = {col: registered[fx_clean_col(col)]["sql_type"] for col in header}
+        cast_dtypes = {fx_clean_col(col): dtype for col, dtype in raw_dtypes.items() if dtype is not str}
+        text_cols = {col for col, sql_type in raw_mapping.items() if sql_type == "TEXT" and fx_clean_col(col) not in cast_dtypes}
+        dtype_mapping = {fx_clean_col(col): sql_type for col, sql_type in raw_mapping.items()}
+        print(f"  Parsing with the schema registered for {source} (single pass)")
+    else:
+        if csv_file.endswith(".parquet"):
+            raw_mapping, text_cols = fx_parquet_dtypes(file_path), set()
+        else:
+            raw_mapping, text_cols = fx_scan_csv_dtypes(file_path)
+        observed = {fx_clean_col(col): {"sql_type": sql_type} for col, sql_type in raw_mapping.items()}
+        dtype_mapping = fx_apply_schema_registry(table, observed, conn)
+    print("Column list and types:")
+    for col, sql_type in dtype_mapping.items():
+        print(f"  {col:30} -> {sql_type}")
+
+    counter = {"rows": 0}
+    drifted = set()
+
+    def chunks():
+        for chunk in fx_iter_file_chunks(file_path, list(raw_mapping), text_cols):
+            if cast_dtypes:
+                chunk, drifts = fx_cast_chunk(chunk, cast_dtypes, registered, drifted)
+                if drifts:
+                    print(f"  ⚠ Schema drift on {source} (registered types kept):")
+                    for col, registered_type, observed_type in drifts:
+                        print(f"    {col:30} {registered_type} -> {observed_type}")
+                    record_drift(source, drifts, conn)
+            counter["rows"] += len(chunk)
+            yield chunk
+
+    table_name = fx_create_table(
+        "BRONZE",
+        table,
+        chunks(),
+        dtype_mapping,
+        conn,
+        mode=BRONZE_WRITE_MODE,
+        indexes=fx_bronze_indexes(dtype_mapping)
+    )
+    return table_name, counter["rows"]
+
+
+## Create fx_frame_schema function ----
+def fx_frame_schema(df):
+    """Returns the observed schema of a dataframe: {col: {"sql_type", "dtype"}}."""
+    return {col: {"sql_type": fx_map_dtype(df[col].dtype), "dtype": str(df[col].dtype)} for col in df.columns}
+
+
+## Create fx_apply_schema_registry function ----
+def fx_apply_schema_registry(table, observed, conn):
+    """Checks the observed schema of a load against the schema registered for its table, and returns the
+    {col: sql_type} mapping to create the table with.
+    First load: the observed schema is registered. Later loads: the registered types are kept, any difference
+    is flagged (printed and stored in _schema_drift) instead of changing the table definition. New columns are registered."""
+    source = f"BRONZE_{table}"
+    registered = get_schema(source, conn)
+    if registered is None:
+        set_schema(source, observed, conn)
+        print(f"  Schema registered for {source}")
+        return {col: entry["sql_type"] for col, entry in observed.items()}
+
+    drifts = compare_schema(registered, observed)
+    if drifts:
+        print(f"  ⚠ Schema drift on {source} (registered types kept):")
+        for col, registered_type, observed_type in drifts:
+            print(f"    {col:30} {registered_type} -> {observed_type}")
+        record_drift(source, drifts, conn)
+
+    new_cols = {col: entry for col, entry in observed.items() if col not in registered}
+    if new_cols:
+        set_schema(source, {**registered, **new_cols}, conn)
+    return {col: registered.get(col, entry)["sql_type"] for col, entry in observed.items()}
+
+
+## Create fx_registered_dtypes function ----
+def fx_registered_dtypes(file_path, registered):
+    """Returns the explicit parse dtype of each csv column ({raw column name: dtype}) from the registered schema."""
+    header = pd.read_csv(file_path, nrows=0).columns
+    dtypes = parse_dtypes(registered)
+    return {col: dtypes[fx_clean_col(col)] for col in header if fx_clean_col(col) in dtypes}
+
+
+## Create fx_parse_file function ----
+def fx_parse_file(file_path, registered=None):
+    """Reads a csv or parquet file in a dataframe with cleaned column names.
+    With a registered schema, the csv columns are parsed with explicit dtypes instead of being inferred;
+    if the content does not fit them anymore, the file is parsed with inference (the drift is flagged by the writer).
+    Runs in a worker process when BRONZE_PARSE_WORKERS > 1."""
+    if file_path.endswith(".parquet"):
+        df = fx_read_parquet(file_path)
+    elif registered:
+        raw_dtypes = fx_registered_dtypes(file_path, registered)
+        try:
+            df = pd.read_csv(file_path, dtype=raw_dtypes)
+        except (ValueError, TypeError) as error:
+            print(f"  ⚠ {os.path.basename(file_path)} does not fit its registered dtypes ({error}), inferring them")
+            df = pd.read_csv(file_path)
+    else:
+        df = pd.read_csv(file_path)
     df.columns = [fx_clean_col(col) for col in df.columns]
-    
-    ### Dtype definition ----
-    dtype_mapping = {col: fx_map_dtype(df[col].dtype) for col in df.columns}
+    return df
+
+
+## Create fx_write_file_to_bronze function ----
+def fx_write_file_to_bronze(csv_file, df, conn):
+    table = os.path.splitext(csv_file)[0].upper()
+    dtype_mapping = fx_apply_schema_registry(table, fx_frame_schema(df), conn)
     print("Column list and types:")
     for col, sql_type in dtype_mapping.items():
         print(f"  {col:30} -> {sql_type}")
@@ -101,62 +387,225 @@ def fx_process_csv_to_bronze(csv_file, conn):
     ### Create table ----
     table_name = fx_create_table(
         "BRONZE",
-        os.path.splitext(csv_file)[0].upper(),
+        table,
         df,
         dtype_mapping,
-        conn
+        conn,
+        mode=BRONZE_WRITE_MODE,
+        indexes=fx_bronze_indexes(dtype_mapping)
     )
     return table_name, len(df)
 
 
+## Create fx_process_csv_to_bronze function ----
+def fx_process_csv_to_bronze(csv_file, conn):
+    if BRONZE_LOAD_MODE == "chunked":
+        return fx_process_file_chunked(csv_file, conn)
+
+    registered = get_schema(f"BRONZE_{os.path.splitext(csv_file)[0].upper()}", conn)
+    df = fx_parse_file(os.path.join(SOURCE_PATH, csv_file), registered)
+    return fx_write_file_to_bronze(csv_file, df, conn)
+
+
+## Create fx_iter_parsed_files function ----
+def fx_iter_parsed_files(csv_files, schemas, workers=BRONZE_PARSE_WORKERS):
+    """Parses the files over a process pool and yields (csv_file, df) as soon as each one is ready.
+    schemas gives the registered schema of each file (read by the caller, the workers do not touch the database).
+    At most 2 x workers files are submitted ahead of the writer, so parsed dataframes do not pile up in memory."""
+    pending = list(csv_files)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+        while pending or futures:
+            while pending and len(futures) < 2 * workers:
+                csv_file = pending.pop(0)
+                future = executor.submit(fx_parse_file, os.path.join(SOURCE_PATH, csv_file), schemas.get(csv_file))
+                futures[future] = csv_file
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                csv_file = futures.pop(future)
+                yield csv_file, future.result()
+
+
 # ==================================================================
 # LOAD CSV FILES ----
 # ==================================================================
 def fx_load_csv_files_to_bronze(conn):
-    """Incremental load: only process CSV files modified since last run."""
-    last_run = get_watermark("bronze_csv_files")
-
-    csv_files = [f for f in os.listdir(CSV_PATH) if f.endswith(".csv")]
+    """Incremental load: only process CSV (or parquet) files whose content changed since last run."""
+    csv_files = sorted(f for f in os.listdir(SOURCE_PATH) if f.endswith(f".{INTERMEDIATE_FORMAT}"))
     total_files = len(csv_files)
-    print(f"Found {total_files} CSV file(s) in {CSV_PATH}")
+    print(f"Found {total_files} {INTERMEDIATE_FORMAT} file(s) in {SOURCE_PATH}")
 
-    file_counter = 0
-    latest_mtime = last_run
+    # Content-hash manifest: a touched or copied file with the same content is not reloaded
+    changed, manifest_entries = detect_changes(
+        "bronze_files", [os.path.join(SOURCE_PATH, f) for f in csv_files], conn
+    )
 
+    changed_files = []
     for csv_file in csv_files:
-        file_path = os.path.join(CSV_PATH, csv_file)
-        file_mtime = datetime.fromtimestamp(os.path.getmtime(file_path), tz=timezone.utc).isoformat()
-
-        if last_run and file_mtime <= last_run:
+        if os.path.join(SOURCE_PATH, csv_file) not in changed:
             print(f"  ↷ Skipping (unchanged): {csv_file}")
-            continue
-
-        file_counter += 1
-        print("-" * 40)
-        print(f"  Processing {file_counter}: {csv_file}")
-        print("-" * 40)
-
-        table_name, rows = fx_process_csv_to_bronze(csv_file, conn)
-        print(f"  ✓ {table_name} — {rows} rows inserted")
-
-        # Track the most recent mtime across all processed files
-        if latest_mtime is None or file_mtime > latest_mtime:
-            latest_mtime = file_mtime
+        else:
+            changed_files.append(csv_file)
+
+    # Loads and manifest commit together: a crash before the commit reloads the same files, never a second batch
+    with transaction(conn):
+        file_counter = 0
+        if BRONZE_PARSE_WORKERS > 1 and BRONZE_LOAD_MODE != "chunked" and len(changed_files) > 1:
+            # Workers parse, this process is the only writer: SQLite keeps a single writer and a single transaction
+            print(f"Parsing {len(changed_files)} file(s) over {BRONZE_PARSE_WORKERS} worker processes")
+            start_all = time.perf_counter()
+            total_rows = 0
+            schemas = {f: get_schema(f"BRONZE_{os.path.splitext(f)[0].upper()}", conn) for f in changed_files}
+            for csv_file, df in fx_iter_parsed_files(changed_files, schemas):
+                file_counter += 1
+                print("-" * 40)
+                print(f"  Writing {file_counter}: {csv_file}")
+                print("-" * 40)
+
+                start = time.perf_counter()
+                table_name, rows = fx_write_file_to_bronze(csv_file, df, conn)
+                elapsed = time.perf_counter() - start
+                total_rows += rows
+                print(f"  ✓ {table_name} — {rows} rows inserted in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s)")
+
+            elapsed_all = time.perf_counter() - start_all
+            print(f"\n  {total_rows} rows parsed and inserted in {elapsed_all:.1f}s ({total_rows / max(elapsed_all, 1e-9):,.0f} rows/s)")
+        else:
+            for csv_file in changed_files:
+                file_counter += 1
+                print("-" * 40)
+                print(f"  Processing {file_counter}: {csv_file}")
+                print("-" * 40)
+
+                start = time.perf_counter()
+                table_name, rows = fx_process_csv_to_bronze(csv_file, conn)
+                elapsed = time.perf_counter() - start
+                print(f"  ✓ {table_name} — {rows} rows inserted in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s)")
+
+        # Also saved when nothing changed, so touched files take the size + mtime fast path next run
+        set_manifest_entries("bronze_files", manifest_entries, conn)
 
     if file_counter == 0:
-        print("No new or modified CSV files. Skipping.")
+        print("No new or modified files. Skipping.")
         return
 
-    set_watermark("bronze_csv_files", latest_mtime, "timestamp")
-    print(f"\n  Watermark updated to: {latest_mtime}")
+    print(f"\n  Manifest updated for {file_counter} file(s)")
     
     
+# ==================================================================
+# LOAD XLSX FILES (single pass, no intermediate file) ----
+# ==================================================================
+## Create fx_bronze_value function ----
+def fx_bronze_value(value, kind, profile):
+    """Converts a cell value to the value the csv path would have inserted for a column of the given kind."""
+    if value is None:
+        return None
+    if kind == "int":
+        return int(value)
+    if kind == "float":
+        return float(value)
+    if kind == "datetime":
+        return fx_format_value(value, kind, profile)
+    if kind == "bool":
+        return value
+    return str(value)
+
+
+## Create fx_iter_bronze_chunks function ----
+def fx_iter_bronze_chunks(file_path, sheet, columns, kinds, profiles, counter, chunk_size=CHUNK_SIZE):
+    """Yields the sheet rows as dataframes of chunk_size rows, converted like the csv path would, and counts them."""
+    for chunk in fx_iter_row_chunks(file_path, sheet, len(columns), chunk_size):
+        rows = [
+            [fx_bronze_value(value, kind, profile) for value, kind, profile in zip(values, kinds, profiles)]
+            for values in chunk
+        ]
+        counter["rows"] += len(rows)
+        yield pd.DataFrame(rows, columns=columns)
+
+
+## Create fx_process_sheet_to_bronze function ----
+def fx_process_sheet_to_bronze(file, sheet, conn):
+    """Streams one sheet from the raw workbook into its BRONZE table (same table name as the csv path)."""
+    file_path = os.path.join(RAW_PATH, file)
+    table = os.path.splitext(fx_build_output_name(file, sheet))[0].upper()
+
+    if not file.endswith(".xlsx"):
+        # .xls workbooks have no read-only row iterator: parse the whole sheet
+        df = pd.read_excel(file_path, sheet_name=sheet)
+        df.columns = [fx_clean_col(str(col)) for col in df.columns]
+        dtype_mapping = fx_apply_schema_registry(table, fx_frame_schema(df), conn)
+        table_name = fx_create_table(
+            "BRONZE", table, df, dtype_mapping, conn, mode=BRONZE_WRITE_MODE, indexes=fx_bronze_indexes(dtype_mapping)
+        )
+        return table_name, len(df)
+
+    ### Pass 1: profile the columns to type them ----
+    header, profiles = fx_profile_sheet(file_path, sheet)
+    columns = [fx_clean_col(col) for col in header]
+    kinds = [fx_resolve_column_kind(profile) for profile in profiles]
+    observed = {col: {"sql_type": KIND_SQL_TYPES.get(kind, "TEXT")} for col, kind in zip(columns, kinds)}
+    dtype_mapping = fx_apply_schema_registry(table, observed, conn)
+    print("Column list and types:")
+    for col, sql_type in dtype_mapping.items():
+        print(f"  {col:30} -> {sql_type}")
+
+    ### Pass 2: insert the rows by chunks ----
+    counter = {"rows": 0}
+    table_name = fx_create_table(
+        "BRONZE",
+        table,
+        fx_iter_bronze_chunks(file_path, sheet, columns, kinds, profiles, counter),
+        dtype_mapping,
+        conn,
+        mode=BRONZE_WRITE_MODE,
+        indexes=fx_bronze_indexes(dtype_mapping)
+    )
+    return table_name, counter["rows"]
+
+
+## Create fx_load_xlsx_files_to_bronze function ----
+def fx_load_xlsx_files_to_bronze(conn):
+    """Incremental load straight from the raw workbooks: only the sheets whose content changed since last run."""
+    excel_files = sorted(f for f in os.listdir(RAW_PATH) if f.endswith(".xlsx") or f.endswith(".xls"))
+    print(f"Found {len(excel_files)} Excel file(s) in {RAW_PATH}")
+
+    changed, manifest_entries = detect_changes(
+        "bronze_xlsx", [os.path.join(RAW_PATH, f) for f in excel_files], conn, with_sheets=True
+    )
+
+    # Loads and manifest commit together: a crash before the commit reloads the same sheets, never a second batch
+    with transaction(conn):
+        sheet_counter = 0
+        for file in excel_files:
+            sheets = changed.get(os.path.join(RAW_PATH, file))
+            if not sheets:
+                print(f"  ↷ Skipping (unchanged): {file}")
+                continue
+
+            for sheet in sheets:
+                sheet_counter += 1
+                print("-" * 40)
+                print(f"  Processing {sheet_counter}: {file} / {sheet}")
+                print("-" * 40)
+
+                table_name, rows = fx_process_sheet_to_bronze(file, sheet, conn)
+                print(f"  ✓ {table_name} — {rows} rows inserted")
+
+        set_manifest_entries("bronze_xlsx", manifest_entries, conn)
+
+    if sheet_counter == 0:
+        print("No new or modified sheets. Skipping.")
+        return
+
+    print(f"\n  Manifest updated for {sheet_counter} sheet(s)")
+
+
 # ==================================================================
 # RFM table creation ----
 # ==================================================================
 def fx_load_rfm_mapping_to_bronze(conn):
     """RFM mapping — reloads only if the Excel file changed since last run."""
-    last_run = get_watermark("bronze_rfm_mapping")
+    last_run = get_watermark("bronze_rfm_mapping", conn)
 
     file_mtime = datetime.fromtimestamp(os.path.getmtime(RFM_PATH), tz=timezone.utc).isoformat()
 
@@ -173,8 +622,9 @@ def fx_load_rfm_mapping_to_bronze(conn):
         'RFM_NAME': 'TEXT'
     }
 
-    fx_create_table('BRONZE', 'RFM_MAPPING', df, dtype_mapping, conn)
-    set_watermark("bronze_rfm_mapping", file_mtime, "timestamp")
+    with transaction(conn):
+        fx_create_table('BRONZE', 'RFM_MAPPING', df, dtype_mapping, conn)
+        set_watermark("bronze_rfm_mapping", file_mtime, "timestamp", conn=conn)
     print("  ✓ BRONZE_RFM_MAPPING loaded and watermark updated.")
 
 
@@ -185,8 +635,11 @@ def run():
     print("\n########### script_layer_bronze | Start ###########")
     try:
         conn = fx_connect_db()
-        with conn:
-            fx_load_csv_files_to_bronze(conn)
+        with transaction(conn):
+            if BRONZE_SOURCE == "xlsx":
+                fx_load_xlsx_files_to_bronze(conn)
+            else:
+                fx_load_csv_files_to_bronze(conn)
             fx_load_rfm_mapping_to_bronze(conn)
 
         print("=" * 50)
@@ -51,7 +51,7 @@ from module_export_data_to_xlsx import *
 
 # 2. Connect to database ----
 print(f"\n########### Connect to database ###########")
-conn = fx_connect_db()
+conn = fx_connect_db(read_only=True)
 cursor = conn.cursor()
 
 
@@ -13,7 +13,7 @@ from module_create_table import *
 
 # 2. Connect to database ----
 print(f"\n########### Connect to DB ###########")
-conn = fx_connect_db()
+conn = fx_connect_db(read_only=True)
 cursor = conn.cursor()
 
 
@@ -36,8 +36,10 @@ from sklearn import metrics
 import matplotlib.pyplot as plt
 
 from src.utils.connecting_to_database import fx_connect_db
-from src.utils.create_table import fx_create_table
+from src.utils.create_table import GOLD_WRITE_MODE, fx_create_table
 from src.utils.export_data_to_xlsx import fx_export_data_to_excel
+from src.utils.db import transaction
+from src.utils.dtypes import fx_from_epoch, fx_watermark_epoch
 from src.utils.watermark import get_watermark, set_watermark
 
 # ── Data loading ──────────────────────────────────────────────────
@@ -70,10 +72,11 @@ def fx_load_and_clean_sales(conn) -> pd.DataFrame:
     df = df[df["QUANTITY"] > 0]
     df = df[df["PRICE"] > 0]
     df = df[df["CUSTOMER_ID"] != "UNKNOWN"]
-    df = df.dropna(subset=["CUSTOMER_ID", "INVOICE_DATE", "REVENUE"])
+    df = df.dropna(subset=["CUSTOMER_ID", "INVOICE_TS", "REVENUE"])
     print(f"  Rows removed: {initial - len(df)} | Final shape: {df.shape}")
 
-    df["INVOICE_DATE"] = pd.to_datetime(df["INVOICE_DATE"])
+    # Day of the invoice, rebuilt from the integer timestamp (no text parsing)
+    df["INVOICE_DATE"] = fx_from_epoch(df["INVOICE_TS"]).dt.normalize()
     df["YEAR_MONTH"] = df["INVOICE_DATE"].dt.to_period("M").astype(str)
     df["CUSTOMER_ID"] = df["CUSTOMER_ID"].astype(str)
 
@@ -353,7 +356,7 @@ def fx_create_cltv_tables(df_predictions, df_results,
         "ERROR":         "REAL",
         "ERROR_PCT":     "REAL"
     }
-    fx_create_table("GOLD", "DIM_CUSTOMER_CLTV", df_predictions, dtype_cltv, conn)
+    fx_create_table("GOLD", "DIM_CUSTOMER_CLTV", df_predictions, dtype_cltv, conn, mode=GOLD_WRITE_MODE)
     print(f"  ✓ GOLD_DIM_CUSTOMER_CLTV — {len(df_predictions)} rows")
 
     ### GOLD_DIM_CLTV_MODEL_RESULTS ----
@@ -366,7 +369,7 @@ def fx_create_cltv_tables(df_predictions, df_results,
         "CV_MAE": "REAL"
     }
     fx_create_table("GOLD", "DIM_CLTV_MODEL_RESULTS",
-                    df_results, dtype_results, conn)
+                    df_results, dtype_results, conn, mode=GOLD_WRITE_MODE)
     print(f"  ✓ GOLD_DIM_CLTV_MODEL_RESULTS — {len(df_results)} rows")
 
 # ── Main logic ────────────────────────────────────────────────────
@@ -377,18 +380,20 @@ def fx_run_cltv(conn):
     """Full CLTV pipeline."""
     print("\n########### CLTV Pipeline ###########")
 
-    last_run = get_watermark("gold_cltv")
+    last_run = get_watermark("gold_cltv", conn)
 
-    # Incremental check
-    df_check = pd.read_sql_query(
-        'SELECT MAX(INVOICE_DATE) as MAX_DATE FROM "GOLD_FACT_SALES"', conn
-    )
-    max_gold_date = df_check["MAX_DATE"].iloc[0]
+    # Incremental check (MAX on the INVOICE_TS index)
+    max_gold_ts = conn.execute('SELECT MAX(INVOICE_TS) FROM "GOLD_FACT_SALES"').fetchone()[0]
+    if max_gold_ts is None:
+        print("  GOLD_FACT_SALES is empty. Skipping.")
+        return
 
-    if last_run and max_gold_date <= last_run:
+    if last_run and max_gold_ts <= fx_watermark_epoch(last_run):
         print("  GOLD_FACT_SALES unchanged since last CLTV run. Skipping.")
         return
 
+    max_gold_date = fx_from_epoch(pd.Series([max_gold_ts]))[0].isoformat(sep=" ")
+
     print(f"  New data detected (max gold date: {max_gold_date})")
 
     # Load data
@@ -453,12 +458,10 @@ def fx_run_cltv(conn):
 
     fx_export_data_to_excel(export_dict, "cltv_exploration", "data_exploration")
 
-    # Write to database
-    with conn:
+    # Write to database, with the watermark in the same transaction
+    with transaction(conn):
         fx_create_cltv_tables(df_predictions, df_results, df_importance, conn)
-
-    # Watermark
-    set_watermark("gold_cltv", max_gold_date, "timestamp")
+        set_watermark("gold_cltv", max_gold_date, "timestamp", conn=conn)
     print(f"  ✓ CLTV complete. Watermark: {max_gold_date}")
 
 
@@ -64,7 +64,8 @@ un client peut-il avoir plusieurs pays ?
 ---- quantity
 
 WARNING:
-
+    The gold tables are written with GOLD_WRITE_MODE ("swap" by default, see src/utils/create_table.py):
+    readers keep the previous version of a table until the new one is complete.
 """
 
 # 1. Import librairies ----
@@ -72,14 +73,16 @@ import pandas as pd
 from datetime import datetime, timezone
 
 from src.utils.connecting_to_database import fx_connect_db
-from src.utils.create_table import fx_create_table
+from src.utils.create_table import GOLD_WRITE_MODE, fx_create_table
+from src.utils.db import transaction
+from src.utils.dtypes import fx_from_epoch, fx_read_sql, fx_watermark_epoch
 from src.utils.watermark import get_watermark, set_watermark
 
 # ── Silver table loaders ──────────────────────────────────────────
 
 # 2. Fx load silver tables ----
 def fx_load_silver_tables(conn) -> dict:
-    """Loads all required silver tables into dataframes."""
+    """Loads all required silver tables into dataframes (Arrow strings and categoricals, see src/utils/dtypes.py)."""
     tables = {
         "sales":          "SILVER_SALES",
         "country":        "SILVER_COUNTRY_METADATA",
@@ -90,7 +93,7 @@ def fx_load_silver_tables(conn) -> dict:
     dfs = {}
     for key, table_name in tables.items():
         print(f"  Loading {table_name}...")
-        dfs[key] = pd.read_sql_query(f'SELECT * FROM "{table_name}"', conn)
+        dfs[key] = fx_read_sql(f'SELECT * FROM "{table_name}"', conn)
     return dfs
 
 
@@ -122,9 +125,9 @@ def fx_create_product_ids(df_product: pd.DataFrame) -> pd.DataFrame:
 def fx_build_fact_sales(df_sales, df_country, df_product) -> pd.DataFrame:
     """Joins sales with country and product IDs, adds REVENUE column."""
 
-    ### Add COUNTRY_ID as FK ----
+    ### Add COUNTRY_ID as FK (the silver row fingerprint is not carried to gold) ----
     df = pd.merge(
-        df_sales,
+        df_sales.drop(columns=["ROW_FINGERPRINT"]),
         df_country[["COUNTRY_RAW", "COUNTRY_ID"]],
         left_on="COUNTRY",
         right_on="COUNTRY_RAW",
@@ -153,19 +156,26 @@ def fx_build_fact_sales(df_sales, df_country, df_product) -> pd.DataFrame:
 def fx_create_gold_fact_sales(df_sales, conn):
     print("\n───── GOLD_FACT_SALES ─────")
     dtype_mapping = {
-        "INVOICE":      "TEXT",
-        "STOCKCODE":    "TEXT",
-        "QUANTITY":     "INTEGER",
-        "PRICE":        "REAL",
-        "CUSTOMER_ID":  "TEXT",
-        "INVOICE_DATE": "TEXT",
-        "INVOICE_TIME": "TEXT",
-        "INVOICE_TYPE": "TEXT",
-        "COUNTRY_ID":   "INTEGER",
-        "PRODUCT_ID":   "INTEGER",
-        "REVENUE":      "REAL"
+        "INVOICE":              "TEXT",
+        "STOCKCODE":            "TEXT",
+        "QUANTITY":             "INTEGER",
+        "PRICE":                "REAL",
+        "CUSTOMER_ID":          "TEXT",
+        "INVOICE_DATE":         "TEXT",
+        "INVOICE_TIME":         "TEXT",
+        "INVOICE_TYPE":         "TEXT",
+        "IS_CANCELLATION":      "INTEGER",
+        "IS_ADJUSTMENT":        "INTEGER",
+        "IS_NEGATIVE_QUANTITY": "INTEGER",
+        "INVOICE_MONTH":        "TEXT",
+        "INVOICE_DATE_KEY":     "INTEGER",
+        "INVOICE_TS":           "INTEGER",
+        "COUNTRY_ID":           "INTEGER",
+        "PRODUCT_ID":           "INTEGER",
+        "REVENUE":              "REAL"
     }
-    fx_create_table("GOLD", "FACT_SALES", df_sales, dtype_mapping, conn)
+    fx_create_table("GOLD", "FACT_SALES", df_sales, dtype_mapping, conn, mode=GOLD_WRITE_MODE,
+                    indexes=["INVOICE_DATE_KEY", "INVOICE_TS"])
     print(f"  ✓ GOLD_FACT_SALES — {len(df_sales)} rows")
 
 
@@ -182,7 +192,7 @@ def fx_create_gold_dim_country(df_country, conn):
         "TIMEZONE":             "TEXT",
         "COUNTRY_ID":           "INTEGER"
     }
-    fx_create_table("GOLD", "DIM_COUNTRY", df, dtype_mapping, conn)
+    fx_create_table("GOLD", "DIM_COUNTRY", df, dtype_mapping, conn, mode=GOLD_WRITE_MODE)
     print(f"  ✓ GOLD_DIM_COUNTRY — {len(df)} rows")
 
 
@@ -195,7 +205,7 @@ def fx_create_gold_dim_product(df_product, conn):
         "PRODUCT_NAME":    "TEXT",
         "PRODUCT_ID":      "INTEGER"
     }
-    fx_create_table("GOLD", "DIM_PRODUCT", df_product, dtype_mapping, conn)
+    fx_create_table("GOLD", "DIM_PRODUCT", df_product, dtype_mapping, conn, mode=GOLD_WRITE_MODE)
     print(f"  ✓ GOLD_DIM_PRODUCT — {len(df_product)} rows")
 
 
@@ -207,7 +217,7 @@ def fx_create_gold_dim_exchange_rate(df_exchange_rate, conn):
         "CURRENCY":             "TEXT",
         "EXCHANGE_RATE_TO_GBP": "REAL"
     }
-    fx_create_table("GOLD", "DIM_EXCHANGE_RATE", df_exchange_rate, dtype_mapping, conn)
+    fx_create_table("GOLD", "DIM_EXCHANGE_RATE", df_exchange_rate, dtype_mapping, conn, mode=GOLD_WRITE_MODE)
     print(f"  ✓ GOLD_DIM_EXCHANGE_RATE — {len(df_exchange_rate)} rows")
 
 ## Fx create gold dim rfm mapping -----
@@ -218,7 +228,7 @@ def fx_create_gold_dim_rfm_mapping(df_rfm_mapping, conn):
         "RFM_SEGMENT": "TEXT",
         "RFM_NAME":    "TEXT"
     }
-    fx_create_table("GOLD", "DIM_RFM_MAPPING", df_rfm_mapping, dtype_mapping, conn)
+    fx_create_table("GOLD", "DIM_RFM_MAPPING", df_rfm_mapping, dtype_mapping, conn, mode=GOLD_WRITE_MODE)
     print(f"  ✓ GOLD_DIM_RFM_MAPPING — {len(df_rfm_mapping)} rows")
 
 
@@ -228,18 +238,19 @@ def fx_create_gold_dim_rfm_mapping(df_rfm_mapping, conn):
 def fx_load_gold_layer(conn):
     print("\n########### Gold Layer ###########")
 
-    last_run = get_watermark("gold_layer")
+    last_run = get_watermark("gold_layer", conn)
 
-    ## Check if silver sales has new data since last gold run ----
-    df_check = pd.read_sql_query(
-        'SELECT MAX(INVOICE_DATE) as MAX_DATE FROM "SILVER_SALES"', conn
-    )
-    max_silver_date = df_check["MAX_DATE"].iloc[0]
+    ## Check if silver sales has new data since last gold run (MAX on the INVOICE_TS index) ----
+    max_silver_ts = conn.execute('SELECT MAX(INVOICE_TS) FROM "SILVER_SALES"').fetchone()[0]
+    if max_silver_ts is None:
+        print("  SILVER_SALES is empty. Skipping.")
+        return
 
-    if last_run and max_silver_date <= last_run:
+    if last_run and max_silver_ts <= fx_watermark_epoch(last_run):
         print("  Silver data unchanged since last gold run. Skipping.")
         return
 
+    max_silver_date = fx_from_epoch(pd.Series([max_silver_ts]))[0].isoformat(sep=" ")
     print(f"  New data detected (max silver date: {max_silver_date})")
 
     ## Load all silver tables ----
@@ -254,15 +265,14 @@ def fx_load_gold_layer(conn):
         dfs["sales"], dfs["country"], dfs["product"]
     )
 
-    ## Write all gold tables ----
-    fx_create_gold_fact_sales(df_fact_sales, conn)
-    fx_create_gold_dim_country(dfs["country"], conn)
-    fx_create_gold_dim_product(dfs["product"], conn)
-    fx_create_gold_dim_exchange_rate(dfs["exchange_rate"], conn)
-    fx_create_gold_dim_rfm_mapping(dfs["rfm_mapping"], conn)
-
-    ## Watermark = max invoice date in silver sales ----
-    set_watermark("gold_layer", max_silver_date, "timestamp")
+    ## Write all gold tables and the watermark (max invoice timestamp in silver sales) in one transaction ----
+    with transaction(conn):
+        fx_create_gold_fact_sales(df_fact_sales, conn)
+        fx_create_gold_dim_country(dfs["country"], conn)
+        fx_create_gold_dim_product(dfs["product"], conn)
+        fx_create_gold_dim_exchange_rate(dfs["exchange_rate"], conn)
+        fx_create_gold_dim_rfm_mapping(dfs["rfm_mapping"], conn)
+        set_watermark("gold_layer", max_silver_date, "timestamp", conn=conn)
     print(f"\n  Watermark updated to: {max_silver_date}")
 
 
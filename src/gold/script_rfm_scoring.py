@@ -195,8 +195,10 @@ import datetime as dt
 from datetime import datetime, timezone
 
 from src.utils.connecting_to_database import fx_connect_db
-from src.utils.create_table import fx_create_table
+from src.utils.create_table import GOLD_WRITE_MODE, fx_create_table
 from src.utils.export_data_to_xlsx import fx_export_data_to_excel
+from src.utils.db import transaction
+from src.utils.dtypes import fx_from_epoch, fx_read_sql, fx_watermark_epoch
 from src.utils.watermark import get_watermark, set_watermark
 
 
@@ -207,14 +209,15 @@ from src.utils.watermark import get_watermark, set_watermark
 def fx_prepare_sales(conn) -> pd.DataFrame:
     """Loads GOLD_FACT_SALES and filters for valid sales only."""
     print("\n########### Load GOLD_FACT_SALES ###########")
-    df = pd.read_sql_query('SELECT * FROM "GOLD_FACT_SALES"', conn)
+    df = fx_read_sql('SELECT * FROM "GOLD_FACT_SALES"', conn)
 
-    df["INVOICE_DATE"] = pd.to_datetime(df["INVOICE_DATE"])
+    # Day of the invoice, rebuilt from the integer timestamp (no text parsing)
+    df["INVOICE_DATE"] = fx_from_epoch(df["INVOICE_TS"]).dt.normalize()
 
     # Keep valid sales only
     df = df[df["QUANTITY"] > 0]
     df = df[df["PRICE"] > 0]
-    df = df[df["CUSTOMER_ID"] != "UNKNOWN"]
+    df = df[df["CUSTOMER_ID"].ne("UNKNOWN").fillna(True)]
 
     print(f"  {len(df)} valid sales rows loaded")
     print(f"  {df['CUSTOMER_ID'].nunique()} unique customers")
@@ -358,18 +361,20 @@ def fx_build_score_summaries(df_rfm: pd.DataFrame) -> tuple:
 def fx_load_gold_rfm_scoring(conn):
     print("\n########### Gold RFM Scoring ###########")
 
-    last_run = get_watermark("gold_rfm_scoring")
+    last_run = get_watermark("gold_rfm_scoring", conn)
 
-    ### Incremental check — skip if GOLD_FACT_SALES hasn't changed ----
-    df_check = pd.read_sql_query(
-        'SELECT MAX(INVOICE_DATE) as MAX_DATE FROM "GOLD_FACT_SALES"', conn
-    )
-    max_gold_date = df_check["MAX_DATE"].iloc[0]
+    ### Incremental check — skip if GOLD_FACT_SALES hasn't changed (MAX on the INVOICE_TS index) ----
+    max_gold_ts = conn.execute('SELECT MAX(INVOICE_TS) FROM "GOLD_FACT_SALES"').fetchone()[0]
+    if max_gold_ts is None:
+        print("  GOLD_FACT_SALES is empty. Skipping.")
+        return
 
-    if last_run and max_gold_date <= last_run:
+    if last_run and max_gold_ts <= fx_watermark_epoch(last_run):
         print("  GOLD_FACT_SALES unchanged since last RFM run. Skipping.")
         return
 
+    max_gold_date = fx_from_epoch(pd.Series([max_gold_ts]))[0].isoformat(sep=" ")
+
     print(f"  New data detected (max gold date: {max_gold_date})")
 
     ### Pipeline ----
@@ -419,9 +424,9 @@ def fx_load_gold_rfm_scoring(conn):
         "RFM_SCORE":                 "TEXT"
     }
 
-    fx_create_table("GOLD", "DIM_CUSTOMER_RFM", df_rfm, dtype_mapping, conn)
-
-    set_watermark("gold_rfm_scoring", max_gold_date, "timestamp")
+    with transaction(conn):
+        fx_create_table("GOLD", "DIM_CUSTOMER_RFM", df_rfm, dtype_mapping, conn, mode=GOLD_WRITE_MODE)
+        set_watermark("gold_rfm_scoring", max_gold_date, "timestamp", conn=conn)
     print(f"  ✓ GOLD_DIM_CUSTOMER_RFM — {len(df_rfm)} customers. "
           f"Watermark: {max_gold_date}")
 
@@ -9,7 +9,8 @@ Script purpose:
 Process:
     01. Create a 'database' folder in ../data/ if it doesn't exists
     02. Create the database ONLINE_RETAIL_II_DATAWAREHOUSE.db in this folder
-    03. Connect to the database
+    03. Connect to the database through the shared connection factory (src/utils/db.py)
+        A new database file is created with SQLITE_PAGE_SIZE (default 8192) before switching to WAL
     End of process
 
 List of functions used: 
@@ -18,6 +19,10 @@ List of functions used:
 Potential improvements: 
     - Not determined yet
 
+Page size:
+    The page size of an existing database is kept: it cannot change once the file is in WAL mode.
+    To apply a new SQLITE_PAGE_SIZE, delete the database file (or VACUUM it outside WAL mode) and rerun.
+
 WARNING:
     Running this script will drop the entire 'DataWarehouse_Online_Retail_II' database if it exists. 
     All data in the database will be permanently deleted. 
@@ -28,21 +33,19 @@ WARNING:
 print(f"\n########### Import librairies ###########")
 import os
 
-import sqlite3
-
+from src.utils.db import DB_PATH, get_connection
 
-DB_PATH = "/opt/airflow/data/database/DATAWAREHOUSE_ONLINE_RETAIL_II.db"
 
 def run():
     print("\n########### create_database | Start ###########")
     try:
         os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
 
-        conn = sqlite3.connect(DB_PATH)
-        conn.close()
+        conn = get_connection()
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
 
         print("=" * 50)
-        print(f"Database created/connected at: {DB_PATH}")
+        print(f"Database created/connected at: {DB_PATH} (page size: {page_size} bytes)")
         print("=" * 50)
 
     except Exception as error:
@@ -3,104 +3,534 @@
 Convert all Excel files's tabs to individual csv files
 =============================================================
 Script purpose:
-    This script extract each tabs from Excel files in designated folder and export each one of them in another folder. 
+    This script extract each tabs from Excel files in designated folder and export each one of them in another folder.
 
 Process:
     01. Create a CSV folder in ../data/ if it doesn't exist already
     02. Find folder ../data/raw
-    03. For each Excel (xlsx, xls) file in ../data/raw : 
+    03. For each Excel (xlsx, xls) file in ../data/raw, whose content changed since the last run :
+        - The content-hash manifest (src/utils/manifest.py) tells which sheets changed.
+          A file with the same size and mtime is skipped without hashing, a file only touched or copied is not reprocessed
         - Determine how many sheet (tab) this file has
-        - For each sheet :
-            - Put the content in a dataframe (df)
+        - Each changed (file, sheet) pair is a conversion unit. Units run one by one, or over a pool of XLSX_WORKERS processes
+        - For each unit :
             - Take and clean the name of the file
             - Take and clean the name of the sheet
-            - Create csv file name by concatenating clean file name and cleaned sheet name 
-            - Export the df in a csv file in ../data/csv
+            - Create csv file name by concatenating clean file name and cleaned sheet name
+            - Export the sheet content in a csv (../data/csv) or parquet (../data/parquet) file, with one of the two conversion modes:
+                - "pandas" (default): put the whole sheet in a dataframe (df) and export it
+                - "streaming": read the sheet twice with a read-only row iterator
+                    - pass 1 profiles each column (types, nulls, date precision) in constant memory
+                    - pass 2 formats the rows the same way pandas would and writes them by chunks of XLSX_CHUNK_SIZE rows
             - If a file with a similar name exists, overwrite it
+    04. Report every unit that failed. The manifest is only updated if all units succeeded
     End of process
 
-List of functions used: 
-    - None
+Conversion modes:
+    Set with the XLSX_CONVERSION_MODE environment variable ("pandas" or "streaming").
+    The streaming mode keeps the peak memory flat whatever the sheet size (Online Retail II sheets have 500k+ rows),
+    and writes the exact same CSV content as the pandas mode. It only applies to .xlsx files, .xls files always use pandas.
 
-Potential improvements: 
-    - Create a clean function and call it on file and sheet name
-    - Take and clean the name of the file outside the sheets' loop 
+Direct xlsx to bronze:
+    With BRONZE_SOURCE="xlsx", the bronze layer streams the sheets straight from the workbooks and this script
+    does nothing, unless XLSX_AUDIT_FILES=1 asks for the csv/parquet files as an audit copy.
+
+Intermediate format:
+    Set with the INTERMEDIATE_FORMAT environment variable ("csv" or "parquet").
+    With "parquet", each sheet is written to ../data/parquet as a compressed (PARQUET_COMPRESSION, zstd by default) and typed file:
+    whole numbers with nulls stay integers (Customer ID), mixed columns are strings, dates are timestamps.
+    The bronze layer then reads the schema from the file instead of guessing the types a second time.
+
+List of functions used:
+    - fx_clean_name : transform a file or sheet name with upper + letters, numbers and _ only
+    - fx_build_output_name : concatenate the cleaned file name, sheet name and extension
+    - fx_list_units : list the (file, sheet) units and check that their CSV names are unique
+    - fx_run_units : convert the units sequentially or over a process pool, collect the errors per unit
+    - fx_convert_unit : convert one unit in a temporary file, then move it to its final name
+    - fx_convert_sheet_pandas_parquet : convert a sheet with excel.parse and write it as a typed parquet file
+        - fx_type_dataframe : give explicit types to the parsed columns (nullable integers, strings)
+    - fx_convert_sheet_streaming_parquet : convert a sheet with a read-only row iterator into a typed parquet file
+        - fx_arrow_type : deduce the parquet type of a column from its profile
+        - fx_arrow_value : convert a value to its parquet type
+    - fx_convert_sheet_pandas : convert a sheet with excel.parse (whole sheet in memory)
+    - fx_convert_sheet_streaming : convert a sheet with a read-only row iterator (bounded memory)
+        - fx_convert_cell : convert an openpyxl cell the same way pandas.read_excel does
+        - fx_iter_sheet_rows : yield the rows of a sheet, without the trailing blank rows
+        - fx_value_kind : give the kind (int, float, bool, datetime, object) of a value
+        - fx_profile_sheet : build the header and the column profiles of a sheet
+        - fx_resolve_column_kind : deduce the dtype pandas would give to a column from its profile
+        - fx_format_value : format a value the same way DataFrame.to_csv does
+        - fx_iter_row_chunks : yield the data rows by chunks
+
+Potential improvements:
+    - Not determined yet
 
 WARNING:
-    Running this script will rewrite any CSV file in the folder. 
+    Running this script will rewrite any CSV file in the folder.
     Proceed with caution and ensure you have proper backups before running this script.
 """
 
 # 1. Import libraries ----
 print(f"\n########### Import librairies ###########")
+import csv
 import os
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import re
-from datetime import datetime, timezone
-from src.utils.watermark import get_watermark, set_watermark
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from openpyxl import load_workbook
+from openpyxl.cell.cell import TYPE_ERROR, TYPE_NUMERIC
+
+from src.utils.db import get_connection, transaction
+from src.utils.manifest import detect_changes, set_manifest_entries
 
 
 # Paths inside the Docker container
 RAW_PATH = "/opt/airflow/data/raw"
 CSV_PATH = "/opt/airflow/data/csv"
+PARQUET_PATH = "/opt/airflow/data/parquet"
+
+# Intermediate format between ingestion and bronze ("csv" or "parquet")
+INTERMEDIATE_FORMAT = os.environ.get("INTERMEDIATE_FORMAT", "csv")
+OUTPUT_PATH = PARQUET_PATH if INTERMEDIATE_FORMAT == "parquet" else CSV_PATH
+PARQUET_COMPRESSION = os.environ.get("PARQUET_COMPRESSION", "zstd")
+
+# Conversion settings
+CONVERSION_MODE = os.environ.get("XLSX_CONVERSION_MODE", "pandas")
+CHUNK_SIZE = int(os.environ.get("XLSX_CHUNK_SIZE", "50000"))
+WORKERS = int(os.environ.get("XLSX_WORKERS", "1"))
+
+# With BRONZE_SOURCE="xlsx" the bronze layer reads the workbooks itself: files are only written as an opt-in audit copy
+BRONZE_SOURCE = os.environ.get("BRONZE_SOURCE", "files")
+AUDIT_FILES = os.environ.get("XLSX_AUDIT_FILES", "0") == "1"
+
+# Text cells that read_csv reads back as missing values (default na_values of the pandas read_csv documentation)
+NA_STRINGS = frozenset({
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null"
+})
+
+# Text cells that pandas' type inference turns into numbers
+INT_STRING = re.compile(r'^\s*[+-]?\d+\s*$')
+FLOAT_STRING = re.compile(r'^\s*[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?\s*$|^\s*[+-]?inf(inity)?\s*$', re.IGNORECASE)
+
+
+
+# 2. Define naming functions ----
+## Create fx_clean_name function ----
+def fx_clean_name(name):
+    return re.sub(r'\W+', '_', name.upper())
+
+
+## Create fx_build_output_name function ----
+def fx_build_output_name(file, sheet, extension="csv"):
+    file_name = fx_clean_name(os.path.splitext(file)[0])
+    sheet_name = fx_clean_name(sheet)
+    return f"{file_name}_{sheet_name}.{extension}"
+
+
+
+# 3. Define streaming functions ----
+## Create fx_convert_cell function ----
+def fx_convert_cell(cell):
+    """Same conversion as pandas' openpyxl reader: integral numbers become int, errors and blanks become null."""
+    value = cell.value
+    if value is None or cell.data_type == TYPE_ERROR:
+        return None
+    if cell.data_type == TYPE_NUMERIC and not isinstance(value, bool):
+        as_int = int(value)
+        return as_int if as_int == value else float(value)
+    if isinstance(value, str) and value in NA_STRINGS:
+        return None
+    return value
+
+
+## Create fx_iter_sheet_rows function ----
+def fx_iter_sheet_rows(file_path, sheet):
+    """Yields the converted rows of a sheet (first row is the header).
+    Blank rows are kept as empty lists, except the trailing ones, like pandas does."""
+    workbook = load_workbook(file_path, read_only=True, data_only=True, keep_links=False)
+    try:
+        worksheet = workbook[sheet]
+        worksheet.reset_dimensions()
+        pending_blank_rows = 0
+        for row in worksheet.iter_rows():
+            values = [fx_convert_cell(cell) for cell in row]
+            while values and values[-1] is None:
+                values.pop()
+            if not values:
+                pending_blank_rows += 1
+                continue
+            for _ in range(pending_blank_rows):
+                yield []
+            pending_blank_rows = 0
+            yield values
+    finally:
+        workbook.close()
+
+
+## Create fx_value_kind function ----
+def fx_value_kind(value):
+    """Returns the kind pandas' type inference gives to a non null value."""
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, int):
+        return "int"
+    if isinstance(value, float):
+        return "float"
+    if isinstance(value, datetime):
+        return "datetime"
+    if isinstance(value, str):
+        if INT_STRING.match(value):
+            return "int"
+        if FLOAT_STRING.match(value):
+            return "float"
+    return "object"
+
+
+## Create fx_new_profile function ----
+def fx_new_profile(has_null=False):
+    return {"kinds": set(), "has_null": has_null, "dates_only": True, "has_micro": False, "has_sub_ms": False}
+
+
+## Create fx_profile_sheet function ----
+def fx_profile_sheet(file_path, sheet):
+    """First pass: returns the header and one profile per column, without keeping any row in memory."""
+    rows = fx_iter_sheet_rows(file_path, sheet)
+    header = next(rows, [])
+    profiles = []
+    row_count = 0
+
+    for values in rows:
+        while len(profiles) < len(values):
+            # Previous rows were shorter: pandas pads them with nulls
+            profiles.append(fx_new_profile(has_null=row_count > 0))
+        row_count += 1
+
+        for position, profile in enumerate(profiles):
+            value = values[position] if position < len(values) else None
+            if value is None:
+                profile["has_null"] = True
+                continue
+            kind = fx_value_kind(value)
+            profile["kinds"].add(kind)
+            if kind == "datetime":
+                if (value.hour, value.minute, value.second, value.microsecond) != (0, 0, 0, 0):
+                    profile["dates_only"] = False
+                if value.microsecond:
+                    profile["has_micro"] = True
+                if value.microsecond % 1000:
+                    profile["has_sub_ms"] = True
+
+    # Header: pad to the widest row, name empty cells and de-duplicate like pandas
+    width = max(len(header), len(profiles))
+    while len(profiles) < width:
+        profiles.append(fx_new_profile(has_null=True))
+
+    columns = []
+    seen = {}
+    for position in range(width):
+        name = header[position] if position < len(header) else None
+        name = f"Unnamed: {position}" if name is None else str(name)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        columns.append(name)
+
+    return columns, profiles
+
+
+## Create fx_resolve_column_kind function ----
+def fx_resolve_column_kind(profile):
+    """Deduces the dtype pandas would give to the column: int64, float64, bool, datetime64 or object."""
+    kinds = profile["kinds"]
+    if not kinds:
+        return "empty"
+    if kinds == {"bool"} and not profile["has_null"]:
+        return "bool"
+    if kinds <= {"int", "bool"} and not profile["has_null"]:
+        return "int"
+    if kinds <= {"int", "float", "bool"}:
+        return "float"
+    if kinds == {"datetime"}:
+        return "datetime"
+    return "object"
+
+
+## Create fx_format_value function ----
+def fx_format_value(value, kind, profile):
+    """Formats a value as DataFrame.to_csv would for a column of the given kind."""
+    if value is None:
+        return ""
+    if kind == "int":
+        return str(int(value))
+    if kind == "float":
+        return repr(float(value))
+    if kind == "datetime":
+        if profile["dates_only"]:
+            return value.strftime("%Y-%m-%d")
+        if profile["has_sub_ms"]:
+            return value.strftime("%Y-%m-%d %H:%M:%S.%f")
+        if profile["has_micro"]:
+            return value.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    return str(value)
+
+
+
+# 4. Define conversion functions ----
+## Create fx_convert_sheet_pandas function ----
+def fx_convert_sheet_pandas(file_path, sheet, csv_path):
+    with pd.ExcelFile(file_path) as excel:
+        df = excel.parse(sheet)
+    df.to_csv(csv_path, index=False)
+    return len(df)
+
 
+## Create fx_iter_row_chunks function ----
+def fx_iter_row_chunks(file_path, sheet, width, chunk_size=CHUNK_SIZE):
+    """Second pass: yields the data rows, padded to the header width, by chunks of chunk_size rows."""
+    rows = fx_iter_sheet_rows(file_path, sheet)
+    next(rows, None)  # Skip header
 
+    chunk = []
+    for values in rows:
+        chunk.append(values + [None] * (width - len(values)))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+## Create fx_convert_sheet_streaming function ----
+def fx_convert_sheet_streaming(file_path, sheet, csv_path, chunk_size=CHUNK_SIZE):
+    columns, profiles = fx_profile_sheet(file_path, sheet)
+    kinds = [fx_resolve_column_kind(profile) for profile in profiles]
+
+    rows_written = 0
+    with open(csv_path, "w", newline="", encoding="utf-8") as csv_file:
+        writer = csv.writer(csv_file, lineterminator=os.linesep)
+        writer.writerow(columns)
+
+        for chunk in fx_iter_row_chunks(file_path, sheet, len(columns), chunk_size):
+            writer.writerows([
+                [fx_format_value(value, kind, profile) for value, kind, profile in zip(values, kinds, profiles)]
+                for values in chunk
+            ])
+            rows_written += len(chunk)
+
+    return rows_written
+
+
+
+# 5. Define parquet functions ----
+## Create fx_type_dataframe function ----
+def fx_type_dataframe(df):
+    """Gives explicit types to a parsed sheet before writing it to parquet:
+        - float columns holding only whole numbers and nulls become nullable integers (e.g. Customer ID)
+        - object columns (mixed numbers and text, e.g. Invoice, StockCode) become strings"""
+    for col in df.columns:
+        if pd.api.types.is_float_dtype(df[col]):
+            values = df[col].dropna()
+            if len(values) and df[col].isna().any() and (values == values.round()).all():
+                df[col] = df[col].astype("Int64")
+        elif pd.api.types.is_object_dtype(df[col]):
+            df[col] = df[col].astype("string")
+    return df
+
+
+## Create fx_arrow_type function ----
+def fx_arrow_type(kind, profile):
+    """Parquet type of a streamed column, matching what fx_type_dataframe gives to the same column."""
+    if kind == "int" or (kind == "float" and profile["kinds"] <= {"int", "bool"}):
+        return pa.int64()
+    if kind in ("float", "empty"):
+        return pa.float64()
+    if kind == "bool":
+        return pa.bool_()
+    if kind == "datetime":
+        return pa.timestamp("ns")
+    return pa.string()
+
+
+## Create fx_arrow_value function ----
+def fx_arrow_value(value, arrow_type):
+    if value is None:
+        return None
+    if arrow_type == pa.int64():
+        return int(value)
+    if arrow_type == pa.float64():
+        return float(value)
+    if arrow_type == pa.string():
+        return str(value)
+    return value
+
+
+## Create fx_convert_sheet_pandas_parquet function ----
+def fx_convert_sheet_pandas_parquet(file_path, sheet, parquet_path):
+    with pd.ExcelFile(file_path) as excel:
+        df = excel.parse(sheet)
+    df = fx_type_dataframe(df)
+    df.to_parquet(parquet_path, index=False, compression=PARQUET_COMPRESSION)
+    return len(df)
+
+
+## Create fx_convert_sheet_streaming_parquet function ----
+def fx_convert_sheet_streaming_parquet(file_path, sheet, parquet_path, chunk_size=CHUNK_SIZE):
+    columns, profiles = fx_profile_sheet(file_path, sheet)
+    arrow_types = [fx_arrow_type(fx_resolve_column_kind(profile), profile) for profile in profiles]
+    schema = pa.schema(list(zip(columns, arrow_types)))
+
+    rows_written = 0
+    with pq.ParquetWriter(parquet_path, schema, compression=PARQUET_COMPRESSION) as writer:
+        for chunk in fx_iter_row_chunks(file_path, sheet, len(columns), chunk_size):
+            arrays = [
+                pa.array([fx_arrow_value(values[position], arrow_type) for values in chunk], type=arrow_type)
+                for position, arrow_type in enumerate(arrow_types)
+            ]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            rows_written += len(chunk)
+
+    return rows_written
+
+
+
+## Create fx_convert_unit function ----
+def fx_convert_unit(file_path, sheet, output_path, mode=CONVERSION_MODE, output_format=INTERMEDIATE_FORMAT):
+    """Converts one (file, sheet) unit. Runs in the main process or in a pool worker.
+    The output is written to a temporary file first, so a failed unit never leaves a partial file behind."""
+    tmp_path = f"{output_path}.tmp"
+    streaming = mode == "streaming" and file_path.endswith(".xlsx")
+    try:
+        if output_format == "parquet" and streaming:
+            rows = fx_convert_sheet_streaming_parquet(file_path, sheet, tmp_path)
+        elif output_format == "parquet":
+            rows = fx_convert_sheet_pandas_parquet(file_path, sheet, tmp_path)
+        elif streaming:
+            rows = fx_convert_sheet_streaming(file_path, sheet, tmp_path)
+        else:
+            rows = fx_convert_sheet_pandas(file_path, sheet, tmp_path)
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return rows
+
+
+## Create fx_list_units function ----
+def fx_list_units(changed_sheets):
+    """Returns the (file, sheet, output_name) units of the changed sheets ({file: [sheets]}), in file then sheet order."""
+    units = []
+    for file in sorted(changed_sheets):
+        sheet_names = changed_sheets[file]
+        print(f"  {file}: {len(sheet_names)} changed sheet(s)")
+        for sheet in sheet_names:
+            units.append((file, sheet, fx_build_output_name(file, sheet, INTERMEDIATE_FORMAT)))
+
+    # Two units must never write the same file (e.g. "Year 2010" and "Year_2010")
+    output_names = [output_name for _, _, output_name in units]
+    duplicates = sorted({name for name in output_names if output_names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Several sheets map to the same output name: {duplicates}")
+    return units
+
+
+## Create fx_run_units function ----
+def fx_run_units(units, workers=WORKERS):
+    """Converts all units, sequentially or over a process pool.
+    Returns the list of (file, sheet, error) for the units that failed."""
+    errors = []
+    total_units = len(units)
+
+    if workers > 1:
+        print(f"Converting {total_units} sheet(s) over {workers} worker processes")
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(fx_convert_unit, os.path.join(RAW_PATH, file), sheet, os.path.join(OUTPUT_PATH, output_name)): (file, sheet, output_name)
+                for file, sheet, output_name in units
+            }
+            for future in as_completed(futures):
+                file, sheet, output_name = futures[future]
+                try:
+                    rows = future.result()
+                    print(f"    ✓ Saved: {output_name} ({rows} rows)")
+                except Exception as error:
+                    print(f"    ✗ Failed: {file} / {sheet} — {error}")
+                    errors.append((file, sheet, error))
+        return errors
+
+    unit_counter = 0
+    for file, sheet, output_name in units:
+        unit_counter += 1
+        print(f"  Processing sheet {unit_counter}/{total_units}: {file} / {sheet}")
+        try:
+            rows = fx_convert_unit(os.path.join(RAW_PATH, file), sheet, os.path.join(OUTPUT_PATH, output_name))
+            print(f"    ✓ Saved: {output_name} ({rows} rows)")
+        except Exception as error:
+            print(f"    ✗ Failed: {file} / {sheet} — {error}")
+            errors.append((file, sheet, error))
+    return errors
+
+
+
+# 6. Run ----
 def run():
     print("\n########### xlsx_to_csv | Start ###########")
+    print(f"Conversion mode: {CONVERSION_MODE} | Format: {INTERMEDIATE_FORMAT} | Workers: {WORKERS}")
 
-    os.makedirs(CSV_PATH, exist_ok=True)
+    if BRONZE_SOURCE == "xlsx" and not AUDIT_FILES:
+        print("Bronze loads the workbooks directly (BRONZE_SOURCE=xlsx) and XLSX_AUDIT_FILES is off. Skipping.")
+        return
 
-    # Get watermark — stores the last modification time we processed
-    last_run = get_watermark("ingestion_xlsx_to_csv")
+    os.makedirs(OUTPUT_PATH, exist_ok=True)
 
-    excel_files = [
+    excel_files = sorted(
         f for f in os.listdir(RAW_PATH)
         if f.endswith(".xlsx") or f.endswith(".xls")
-    ]
+    )
     total_files = len(excel_files)
     print(f"Found {total_files} Excel file(s) in raw folder")
 
-    file_counter = 0
+    # Incremental check — only the sheets whose content changed since the last run (content-hash manifest)
+    manifest_stage = f"ingestion_xlsx_to_{INTERMEDIATE_FORMAT}"
+    conn = get_connection()
+    changed, manifest_entries = detect_changes(
+        manifest_stage, [os.path.join(RAW_PATH, f) for f in excel_files], conn, with_sheets=True
+    )
+    changed_sheets = {os.path.basename(file_path): sheets for file_path, sheets in changed.items()}
     for file in excel_files:
-
-        file_path = os.path.join(RAW_PATH, file)
-
-        # Incremental check — skip file if it hasn't been modified since last run
-        file_mtime = datetime.fromtimestamp(os.path.getmtime(file_path), tz=timezone.utc).isoformat()
-        if last_run and file_mtime <= last_run:
+        if file not in changed_sheets:
             print(f"  ↷ Skipping (unchanged): {file}")
-            continue
-
-        file_counter += 1
-        excel = pd.ExcelFile(file_path)
-        total_sheets = len(excel.sheet_names)
-        print(f"Processing file {file_counter}/{total_files}: {file} ({total_sheets} sheet(s))")
 
-        sheet_counter = 0
-        for sheet in excel.sheet_names:
-            sheet_counter += 1
-            print(f"  Processing sheet {sheet_counter}/{total_sheets}: {sheet}")
-
-            df = excel.parse(sheet)
-
-            file_name = re.sub(r'\W+', '_', os.path.splitext(file)[0].upper())
-            sheet_name = re.sub(r'\W+', '_', sheet.upper())
-            csv_name = f"{file_name}_{sheet_name}.csv"
-            csv_path = os.path.join(CSV_PATH, csv_name)
+    if not changed_sheets:
+        # Files may only have been touched: record their new mtime so the next run takes the fast path
+        with transaction(conn):
+            set_manifest_entries(manifest_stage, manifest_entries, conn)
+        print("No new or modified Excel sheets found. Skipping.")
+        return
 
-            df.to_csv(csv_path, index=False)
-            print(f"    ✓ Saved: {csv_name}")
+    units = fx_list_units(changed_sheets)
+    errors = fx_run_units(units)
 
-    if file_counter == 0:
-        print("No new or modified Excel files found. Skipping.")
-        return
+    # Manifest only moves once every unit succeeded, so failed sheets are retried next run
+    if errors:
+        print(f"\n  ✗ {len(errors)}/{len(units)} sheet(s) failed:")
+        for file, sheet, error in errors:
+            print(f"    {file} / {sheet}: {error}")
+        raise RuntimeError(f"{len(errors)} sheet(s) failed to convert. Manifest not updated.")
 
-    # Update watermark to now
-    set_watermark("ingestion_xlsx_to_csv", datetime.utcnow().isoformat(), "timestamp")
+    with transaction(conn):
+        set_manifest_entries(manifest_stage, manifest_entries, conn)
 
     print("=" * 50)
-    print(f"End of CSV conversion — {file_counter} file(s) processed")
+    print(f"End of {INTERMEDIATE_FORMAT} conversion — {len(changed_sheets)} file(s), {len(units)} sheet(s) processed")
     print("=" * 50)
 
 if __name__ == "__main__":
-    run()
\ No newline at end of file
+    run()
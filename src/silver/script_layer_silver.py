@@ -32,15 +32,118 @@ Potential improvements:
         
 WARNING:
 
+Month partitions:
+    SILVER_SALES is partitioned by INVOICE_MONTH (YYYY-MM, indexed). An incremental run reads the months holding
+    bronze rows after the watermark, in full, and replaces only these partitions (fx_create_table mode="partition");
+    the other months are kept. Readers can prune by month with WHERE INVOICE_MONTH ... on the index.
+    A SILVER_SALES table written before the partitions (no INVOICE_MONTH column) is rebuilt once from the whole history.
+
+Typed dates:
+    Next to the INVOICE_DATE / INVOICE_TIME text columns, SILVER_SALES stores INVOICE_DATE_KEY (integer yyyymmdd)
+    and INVOICE_TS (integer epoch seconds, UTC), both indexed. Downstream stages filter and take the max on them
+    (index lookups) and rebuild datetimes from INVOICE_TS without parsing text (src/utils/dtypes.py).
+
+Text cleaning:
+    INVOICE, STOCKCODE, DESCRIPTION and COUNTRY are cleaned with TEXT_RULES / COUNTRY_RULES (strip, upper,
+    whitespace to "_", missing to UNKNOWN) once per distinct value, then mapped back to the rows
+    (fx_clean_text_column, src/utils/text_cleaning.py). Cleaned values are cached in _silver_clean_cache,
+    so an incremental run only cleans the values never seen before. Only the distinct values of the batch are looked up
+    in the cache, so the lookup does not grow with the cache. Changing a rule list invalidates its cache entries.
+
+Incremental read:
+    With a silver_sales watermark, only the bronze rows from the first day of the watermark month are read, filtered by SQLite
+    through an index on INVOICEDATE (IDX_{table}_INVOICEDATE, built by the bronze writer; silver never changes the bronze schema).
+    Bronze dates are ISO text ("YYYY-MM-DD HH:MM:SS"), so the text comparison is a date comparison; the watermark is
+    stored in the same format (a watermark with the "T" separator of older runs is converted).
+    The pandas filter then keeps the months holding rows after the watermark.
+
+Row fingerprint:
+    Each silver row gets ROW_FINGERPRINT, a 64-bit hash of its cleaned line (FINGERPRINT_COLUMNS), under a unique index.
+    Every write anti-joins its rows against the table on it (fx_create_table dedup_key, src/utils/create_table.py):
+    a line already written by an earlier chunk or month of the same write, or loaded twice from the two overlapping
+    workbook sheets (December 2010), is skipped. It does not match lines of earlier runs: a full rebuild starts from
+    an empty table, and an incremental run deletes the months it replaces before the anti-join (the fingerprint holds
+    INVOICE_TS, so a line can only repeat within its own month).
+    Values are hashed as normalised text (fx_fingerprint_text), so the fingerprint does not depend on the chunk dtypes.
+    A SILVER_SALES table without the column is rebuilt once from the whole history.
+
+Streaming mode (SILVER_CHUNK_ROWS > 0):
+    Instead of one dataframe of the whole history, the bronze rows are read, cleaned and written SILVER_CHUNK_ROWS
+    at a time (fx_load_silver_sales_chunked): memory follows the chunk size, not the history size.
+    Duplicates are removed by SQLite before the chunks are cut (SELECT DISTINCT / UNION over the bronze tables,
+    spilled to SQLite's temporary storage), so a row and its copy are dropped even when they would fall in different
+    chunks or tables. The months to rewrite are found in SQL first. Rows come in SQLite's DISTINCT order instead of
+    the bronze order; the data written is the same.
+
+Parallel mode (SILVER_WORKERS > 1):
+    The bronze rows are split by invoice month (fx_bronze_months) and each month is read and cleaned in a process pool
+    of SILVER_WORKERS workers (fx_transform_month), each on its own read-only connection. The cleaned months are
+    funnelled to the single writer (this process) in month order, whatever the order they finish in, so the table is
+    the one a sequential run writes. Duplicates share their invoice date, so they always fall in the same month.
+    Workers clean without the clean cache (their connection cannot write it): the cleaned values are the same.
+    Processes are started with "spawn": no SQLite connection is inherited by a worker.
+
 """
 
+import os
+import multiprocessing
+import numpy as np
 import pandas as pd
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timezone
 
 from src.utils.connecting_to_database import fx_connect_db
-from src.utils.create_table import fx_create_table
-from src.utils.watermark import get_watermark, set_watermark
-
+from src.utils.create_table import fx_create_table, BATCH_ID_COLUMN, INGESTED_AT_COLUMN
+from src.utils.db import DB_PATH, get_connection, transaction
+from src.utils.dtypes import CATEGORICAL_COLUMNS, INVOICE_TYPES, STRING_COLUMNS, fx_date_key, fx_epoch_seconds, fx_optimize_dtypes
+from src.utils.text_cleaning import fx_clean_text_column
+from src.utils.watermark import get_watermarks, set_watermark
+
+# Streaming mode: bronze rows read, cleaned and written per chunk (0 = the whole history in one dataframe)
+SILVER_CHUNK_ROWS = int(os.environ.get("SILVER_CHUNK_ROWS", "0"))
+
+# Parallel mode: worker processes cleaning one invoice month each (0 or 1 = in this process)
+SILVER_WORKERS = int(os.environ.get("SILVER_WORKERS", "0"))
+
+# Partition key of SILVER_SALES (YYYY-MM): a run rewrites only the months it brings
+PARTITION_COLUMN = "INVOICE_MONTH"
+
+# Typed invoice date columns: integer date key (yyyymmdd) and epoch seconds, both indexed
+DATE_KEY_COLUMN = "INVOICE_DATE_KEY"
+TIMESTAMP_COLUMN = "INVOICE_TS"
+
+# Normalisation rules of the text columns, applied once per distinct value (src/utils/text_cleaning.py)
+TEXT_RULES = [("strip",), ("upper",), ("regex", r"\s+", "_")]
+COUNTRY_RULES = TEXT_RULES + [("replace", "UNSPECIFIED", "UNKNOWN")]
+
+# Boolean flag column set from each invoice prefix (C = cancellation, A = bad debt adjustment)
+INVOICE_PREFIX_FLAGS = {"IS_CANCELLATION": "C", "IS_ADJUSTMENT": "A"}
+
+# Row fingerprint: hash of the cleaned line, unique in SILVER_SALES
+FINGERPRINT_COLUMN = "ROW_FINGERPRINT"
+FINGERPRINT_COLUMNS = ("INVOICE", "STOCKCODE", "DESCRIPTION", "QUANTITY", "PRICE", "CUSTOMER_ID", "COUNTRY", "INVOICE_TS")
+
+# Columns of SILVER_SALES
+SALES_DTYPE_MAPPING = {
+    "INVOICE":              "TEXT",
+    "STOCKCODE":            "TEXT",
+    "DESCRIPTION":          "TEXT",
+    "QUANTITY":             "INTEGER",
+    "PRICE":                "REAL",
+    "CUSTOMER_ID":          "TEXT",
+    "COUNTRY":              "TEXT",
+    "INVOICE_DATE":         "TEXT",
+    "INVOICE_TIME":         "TEXT",
+    "INVOICE_TYPE":         "TEXT",
+    "IS_CANCELLATION":      "INTEGER",
+    "IS_ADJUSTMENT":        "INTEGER",
+    "IS_NEGATIVE_QUANTITY": "INTEGER",
+    "INVOICE_MONTH":        "TEXT",
+    "INVOICE_DATE_KEY":     "INTEGER",
+    "INVOICE_TS":           "INTEGER",
+    "ROW_FINGERPRINT":      "INTEGER"
+}
 
 
 # ── Cleaning functions ─────────────────────────────────
@@ -52,30 +155,24 @@ def fx_clean_duplicates(df):
 
 
 ## Clean invoices ----
-def fx_clean_invoice(df):
+def fx_clean_invoice(df, conn=None):
     print(f"\n────────── Clean INVOICE column ──────────")
-    df["INVOICE"] = df["INVOICE"].str.strip().str.upper()
-    df['INVOICE'] = df['INVOICE'].str.replace(r'\s+', '_', regex=True)
-    df['INVOICE'] = df['INVOICE'].fillna("UNKNOWN")
+    df['INVOICE'] = fx_clean_text_column(df['INVOICE'], "INVOICE", TEXT_RULES, conn)
     return df
 
 
 ## Clean stockcode ----
-def fx_clean_stockcode(df):
+def fx_clean_stockcode(df, conn=None):
     print(f"\n───── Clean STOCKCODE column ─────")
-    df['STOCKCODE'] = df["STOCKCODE"].str.strip().str.upper()
-    df['STOCKCODE'] = df['STOCKCODE'].str.replace(r'\s+', '_', regex=True)
-    df['STOCKCODE'] = df['STOCKCODE'].fillna("UNKNOWN")
+    df['STOCKCODE'] = fx_clean_text_column(df['STOCKCODE'], "STOCKCODE", TEXT_RULES, conn)
     return df
 
 
 ## Clean description ----
-def fx_clean_description(df):
+def fx_clean_description(df, conn=None):
     print(f"\n───── Clean DESCRIPTION column ─────")
     print(f"  Before: {df['DESCRIPTION'].nunique()} unique values")
-    df['DESCRIPTION'] = df['DESCRIPTION'].str.strip().str.upper()
-    df['DESCRIPTION'] = df['DESCRIPTION'].str.replace(r'\s+', '_', regex=True)
-    df['DESCRIPTION'] = df['DESCRIPTION'].fillna("UNKNOWN")
+    df['DESCRIPTION'] = fx_clean_text_column(df['DESCRIPTION'], "DESCRIPTION", TEXT_RULES, conn)
     print(f"  After: {df['DESCRIPTION'].nunique()} unique values")
     return df
 
@@ -93,6 +190,9 @@ def fx_clean_invoicedate(df):
     df['INVOICEDATE'] = pd.to_datetime(df['INVOICEDATE'], errors='coerce')
     df['INVOICE_DATE'] = df['INVOICEDATE'].dt.strftime('%Y-%m-%d')
     df['INVOICE_TIME'] = df['INVOICEDATE'].dt.strftime('%H:%M:%S')
+    df[PARTITION_COLUMN] = df['INVOICEDATE'].dt.strftime('%Y-%m')
+    df[DATE_KEY_COLUMN] = fx_date_key(df['INVOICEDATE'])
+    df[TIMESTAMP_COLUMN] = fx_epoch_seconds(df['INVOICEDATE'])
     df = df.drop(columns=['INVOICEDATE'])
     return df
 
@@ -112,34 +212,187 @@ def fx_clean_customer_id(df):
 
 
 ## Clean country ----
-def fx_clean_country(df):
+def fx_clean_country(df, conn=None):
     print(f"\n───── Clean COUNTRY column ─────")
-    df['COUNTRY'] = df['COUNTRY'].str.strip().str.upper()
-    df['COUNTRY'] = df['COUNTRY'].str.replace(r'\s+', '_', regex=True)
-    df['COUNTRY'] = df['COUNTRY'].str.replace('UNSPECIFIED', 'UNKNOWN')
-    df['COUNTRY'] = df['COUNTRY'].fillna('UNKNOWN')
+    df['COUNTRY'] = fx_clean_text_column(df['COUNTRY'], "COUNTRY", COUNTRY_RULES, conn)
     return df
 
 
 ## Mapping return vs sales ----
 def fx_mapping_return_sales(df):
+    """Classifies each row with column operations (no row-wise apply):
+        - IS_CANCELLATION / IS_ADJUSTMENT : invoice starting with 'C' / 'A' (INVOICE_PREFIX_FLAGS)
+        - IS_NEGATIVE_QUANTITY : quantity below 0
+        - INVOICE_TYPE : 'RETURN' for a negative quantity or a non-numeric invoice, 'SALE' otherwise
+    An invoice spans several rows: the string tests run once per distinct invoice and are spread back with its codes.
+    Benchmark: python -m src.benchmarks.bench_return_sales"""
     print(f"\n───── Map Return vs Sales ─────")
-    df['INVOICE_TYPE'] = df.apply(
-        lambda x: 'RETURN' 
-        if (x['QUANTITY'] < 0) or (not x['INVOICE'].isdigit()) 
-        else 'SALE', 
-        axis=1)
+    codes, invoices = pd.factorize(df['INVOICE'])
+
+    def fx_per_row(invoice_test):
+        # Code -1 (missing invoice) takes the trailing False
+        return np.array([isinstance(v, str) and invoice_test(v) for v in invoices] + [False])[codes]
+
+    for flag, prefix in INVOICE_PREFIX_FLAGS.items():
+        df[flag] = fx_per_row(lambda v: v.startswith(prefix))
+    df['IS_NEGATIVE_QUANTITY'] = (df['QUANTITY'] < 0).fillna(False).astype(bool)
+
+    is_numeric_invoice = fx_per_row(str.isdigit)
+    df['INVOICE_TYPE'] = pd.Categorical(
+        np.where(df['IS_NEGATIVE_QUANTITY'] | ~is_numeric_invoice, 'RETURN', 'SALE'), categories=INVOICE_TYPES
+    )
+    return df
+
+
+## Row fingerprint ----
+def fx_fingerprint_text(series):
+    """Returns the text hashed for one fingerprint column: numbers, and text that reads as a number, through float64
+    (5, 5.0 and "5" all give "5.0"), missing values as "nan", other values as they are.
+    Each distinct value is normalised once (pd.factorize), then mapped back to the rows."""
+    codes, uniques = pd.factorize(series)
+    uniques = pd.Series(uniques)
+    if pd.api.types.is_numeric_dtype(uniques):
+        as_number = uniques.astype("float64")
+    else:
+        as_number = pd.to_numeric(uniques.astype(object), errors="coerce").astype("float64")
+    text = uniques.astype(str).mask(as_number.notna(), as_number.astype(str))
+    # Missing values have code -1: the trailing "nan"
+    return pd.Series(np.append(text.to_numpy(dtype=object), "nan")[codes], index=series.index)
+
+
+def fx_add_row_fingerprint(df):
+    """Adds ROW_FINGERPRINT: a 64-bit hash (pd.util.hash_pandas_object, fixed key) of the cleaned FINGERPRINT_COLUMNS.
+    Every value is hashed as text normalised by fx_fingerprint_text, so a line gets the same fingerprint whatever
+    the dtypes of the chunk or run it comes from (e.g. CUSTOMER_ID is float 12345.0, or text "12345" once a chunk
+    holds an UNKNOWN)."""
+    key = pd.DataFrame({col: fx_fingerprint_text(df[col]) for col in FINGERPRINT_COLUMNS})
+    df[FINGERPRINT_COLUMN] = pd.util.hash_pandas_object(key, index=False).to_numpy().view("int64")
+    return df
+
+
+## Transform sales ----
+def fx_transform_sales(df, conn=None):
+    """Runs the cleaning chain on deduplicated bronze rows (INVOICEDATE already parsed) and returns the silver rows."""
+    df = fx_clean_invoice(df, conn)
+    df = fx_clean_stockcode(df, conn)
+    df = fx_clean_description(df, conn)
+    df = fx_clean_quantity(df)
+    df = fx_clean_invoicedate(df)
+    df = fx_clean_price(df)
+    df = fx_clean_customer_id(df)
+    df = fx_clean_country(df, conn)
+    df = fx_mapping_return_sales(df)
+    df = fx_optimize_dtypes(df)
+    df = fx_add_row_fingerprint(df)
     return df
 
 
 
+# ── Bronze reader ─────────────────────────────────────────────────
+
+## Bronze source ----
+def fx_bronze_source(table, conn, since=None):
+    """Returns where to read a bronze table from: (relation, data columns, WHERE conditions, parameters).
+    Append-only tables (BRONZE_WRITE_MODE="append") are read through their {table}_LATEST view (last batch only).
+    With since (ISO text), only the rows with INVOICEDATE >= since are read, through an index on INVOICEDATE."""
+    latest_view = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='view' AND name = ?", (f"{table}_LATEST",)
+    ).fetchone()
+    source = latest_view[0] if latest_view else table
+
+    columns = [row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')
+               if row[1] not in (BATCH_ID_COLUMN, INGESTED_AT_COLUMN)]
+    conditions, params = [], []
+    if since is not None and "INVOICEDATE" in columns:
+        conditions.append("INVOICEDATE >= ?")
+        params.append(since)
+    return source, columns, conditions, params
+
+
+## Read bronze table ----
+def fx_read_bronze_table(table, conn, since=None):
+    """Reads a bronze table (fx_bronze_source): the last batch of an append-only table, without the batch columns,
+    and only the rows with INVOICEDATE >= since when since is given."""
+    source, columns, conditions, params = fx_bronze_source(table, conn, since)
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    df = pd.read_sql_query(f'SELECT * FROM "{source}"{where}', conn, params=params)
+
+    # Text columns as Arrow strings (categoricals are set after the transforms: tables with different
+    # categories would be concatenated as objects)
+    df = fx_optimize_dtypes(df, string_cols=STRING_COLUMNS + CATEGORICAL_COLUMNS, categorical_cols=())
+    return df[[col for col in df.columns if col in columns]]
+
+
+## Months condition ----
+def fx_months_condition(months):
+    """Returns the WHERE condition (and parameters) keeping the bronze rows of the given months (YYYY-MM).
+    The prefix test is bounded by an INVOICEDATE range, so SQLite reads the months through the index.
+    None stands for the rows without INVOICEDATE."""
+    dated = sorted(month for month in months if month is not None)
+    parts, params = [], []
+    if dated:
+        # Every text starting with the last month sorts before that month with its last character incremented
+        upper = dated[-1][:-1] + chr(ord(dated[-1][-1]) + 1)
+        parts.append(f"(INVOICEDATE >= ? AND INVOICEDATE < ? AND substr(INVOICEDATE, 1, 7) IN ({', '.join('?' * len(dated))}))")
+        params.extend([dated[0], upper, *dated])
+    if None in months:
+        parts.append("INVOICEDATE IS NULL")
+    return f"({' OR '.join(parts)})", params
+
+
+## Bronze sales query ----
+def fx_bronze_sales_query(bronze_tables, conn, since=None, months=None):
+    """Returns the query reading every bronze sales table without duplicates, and its parameters:
+    SELECT DISTINCT, or UNION of the tables, so SQLite removes the duplicates, within and across tables,
+    in its temporary storage. A column missing from a table is read as NULL.
+    With since and months, only the rows from since and in these months (fx_months_condition) are read."""
+    sources = [fx_bronze_source(table, conn, since) for table in bronze_tables]
+    columns = list(dict.fromkeys(col for _, table_cols, _, _ in sources for col in table_cols))
+
+    selects, params = [], []
+    for source, table_cols, conditions, source_params in sources:
+        if months:
+            months_sql, months_params = fx_months_condition(months)
+            conditions, source_params = conditions + [months_sql], source_params + months_params
+        select_cols = ", ".join(f'"{col}"' if col in table_cols else f'NULL AS "{col}"' for col in columns)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        selects.append(f'SELECT {select_cols} FROM "{source}"{where}')
+        params.extend(source_params)
+    query = "\nUNION\n".join(selects) if len(selects) > 1 else selects[0].replace("SELECT", "SELECT DISTINCT", 1)
+    return query, params
+
+
+## Stream bronze sales ----
+def fx_stream_bronze_sales(bronze_tables, conn, since=None, months=None, chunk_rows=SILVER_CHUNK_ROWS):
+    """Yields the rows of the bronze sales tables, without duplicates (fx_bronze_sales_query), in dataframes
+    of chunk_rows rows: memory holds one chunk whatever the history size."""
+    query, params = fx_bronze_sales_query(bronze_tables, conn, since, months)
+    for chunk in pd.read_sql_query(query, conn, params=params, chunksize=chunk_rows):
+        yield fx_optimize_dtypes(chunk, string_cols=STRING_COLUMNS + CATEGORICAL_COLUMNS, categorical_cols=())
+
+
+## Bronze months ----
+def fx_bronze_months(bronze_tables, conn, last_run=None):
+    """Returns the months (YYYY-MM) holding bronze rows, found through the INVOICEDATE indexes: every month
+    (None for rows without INVOICEDATE, listed last), or with last_run only the months holding rows after it."""
+    after = pd.Timestamp(last_run).isoformat(sep=" ") if last_run else None
+    months = set()
+    for table in bronze_tables:
+        source, columns, _, _ = fx_bronze_source(table, conn)
+        if "INVOICEDATE" not in columns:
+            continue
+        where, params = (" WHERE INVOICEDATE > ?", (after,)) if after else ("", ())
+        months.update(row[0] for row in conn.execute(
+            f'SELECT DISTINCT substr(INVOICEDATE, 1, 7) FROM "{source}"{where}', params
+        ))
+    return sorted(months, key=lambda month: (month is None, month or ""))
+
+
 # ── Silver Sales ─────────────────────────────────────────────────
 
-def fx_load_silver_sales(conn):
+def fx_load_silver_sales(conn, last_run=None):
     print("\n########### Silver Sales ###########")
     
-    last_run = get_watermark("silver_sales")
-    
     # Load bronze sales tables
     cursor = conn.cursor()
     cursor.execute("""
@@ -153,67 +406,172 @@ def fx_load_silver_sales(conn):
     bronze_tables = [row[0] for row in cursor.fetchall()]
     print(f"Tables studied: {bronze_tables}")
 
+    # A table written before the month partitions, typed dates and fingerprints is rebuilt from the whole history once
+    silver_cols = {row[1] for row in cursor.execute('PRAGMA table_info("SILVER_SALES")')}
+    missing_cols = {PARTITION_COLUMN, DATE_KEY_COLUMN, TIMESTAMP_COLUMN, FINGERPRINT_COLUMN} - silver_cols
+    if last_run and missing_cols:
+        print(f"  SILVER_SALES has no {', '.join(sorted(missing_cols))} column yet: full rebuild")
+        last_run = None
+
+    if SILVER_WORKERS > 1:
+        fx_load_silver_sales_parallel(conn, bronze_tables, last_run)
+        return
 
-    # Create df from each table and add it to list ----
+    if SILVER_CHUNK_ROWS > 0:
+        fx_load_silver_sales_chunked(conn, bronze_tables, last_run)
+        return
+
+
+    # Create df from each table and add it to list (from the first day of the watermark month) ----
     print(f"\n───── Create df from tables ─────")
+    since = pd.Timestamp(last_run).to_period("M").start_time.isoformat(sep=" ") if last_run else None
     df_list = []
     for table in bronze_tables:
-        df_list.append(pd.read_sql_query(f'SELECT * FROM "{table}"', conn))
+        df_list.append(fx_read_bronze_table(table, conn, since))
+    # Tables without rows after the watermark are left out of the concatenation (their dtypes are meaningless)
+    df_list = [df for df in df_list if not df.empty] or df_list[:1]
         
     df_sales = pd.concat(df_list, ignore_index=True) if df_list else pd.DataFrame()
 
 
-    # Incremental filter on INVOICEDATE ----
+    # Incremental filter on INVOICEDATE: whole months holding rows after the watermark ----
     df_sales["INVOICEDATE"] = pd.to_datetime(df_sales["INVOICEDATE"], errors="coerce")
     if last_run:
         before = len(df_sales)
-        df_sales = df_sales[df_sales["INVOICEDATE"] > pd.to_datetime(last_run)]
-        print(f"  Incremental filter: {before} → {len(df_sales)} rows (after {last_run})")
+        months = df_sales["INVOICEDATE"].dt.strftime("%Y-%m")
+        new_months = months[df_sales["INVOICEDATE"] > pd.to_datetime(last_run)].unique()
+        df_sales = df_sales[months.isin(new_months)]
+        print(f"  Incremental filter: {before} → {len(df_sales)} rows "
+              f"(months with rows after {last_run}: {', '.join(sorted(new_months)) or 'none'})")
         
     if df_sales.empty:
         print("  No new sales data. Skipping.")
         return
     
-    # Transformations
-    df = df_sales.copy()
-    df = fx_clean_duplicates(df)
-    df = fx_clean_invoice(df)
-    df = fx_clean_stockcode(df)
-    df = fx_clean_description(df)
-    df = fx_clean_quantity(df)
-    df = fx_clean_invoicedate(df)
-    df = fx_clean_price(df)
-    df = fx_clean_customer_id(df)
-    df = fx_clean_country(df)
-    df = fx_mapping_return_sales(df)
-    
-    dtype_mapping = {
-        "INVOICE":      "TEXT",
-        "STOCKCODE":    "TEXT",
-        "DESCRIPTION":  "TEXT",
-        "QUANTITY":     "INTEGER",
-        "PRICE":        "REAL",
-        "CUSTOMER_ID":  "TEXT",
-        "COUNTRY":      "TEXT",
-        "INVOICE_DATE": "TEXT",
-        "INVOICE_TIME": "TEXT",
-        "INVOICE_TYPE": "TEXT"
-    }
-    
-    fx_create_table("SILVER", "SALES", df, dtype_mapping, conn)
+    # The cleaned-value cache, the table and its watermark commit together: a crash before the commit leaves
+    # them unchanged. Incremental runs replace the month partitions they read, a full rebuild replaces the table
+    new_watermark = df_sales["INVOICEDATE"].max().isoformat(sep=" ")
+    with transaction(conn):
+        # Transformations
+        df = df_sales.copy()
+        df = fx_clean_duplicates(df)
+        df = fx_transform_sales(df, conn)
+
+        fx_create_table("SILVER", "SALES", df, SALES_DTYPE_MAPPING, conn, mode="partition" if last_run else "replace",
+                        indexes=[PARTITION_COLUMN, DATE_KEY_COLUMN, TIMESTAMP_COLUMN], keys=[PARTITION_COLUMN],
+                        dedup_key=FINGERPRINT_COLUMN)
+        set_watermark("silver_sales", new_watermark, "timestamp", conn=conn)
+    print(f"  ✓ SILVER_SALES written — {len(df)} rows. Watermark: {new_watermark}")
+
+
+## Load silver sales in chunks ----
+def fx_load_silver_sales_chunked(conn, bronze_tables, last_run=None, chunk_rows=None):
+    """Streaming version of fx_load_silver_sales: bronze rows are read (fx_stream_bronze_sales), cleaned
+    (fx_transform_sales) and written chunk_rows at a time (SILVER_CHUNK_ROWS by default), so memory holds one chunk.
+    An incremental run streams the months holding rows after the watermark and replaces these partitions;
+    a full rebuild replaces the table. The table and the watermark commit together, after the last chunk."""
+    chunk_rows = chunk_rows or SILVER_CHUNK_ROWS
+    print(f"\n───── Stream bronze sales ({chunk_rows} rows per chunk) ─────")
+
+    since, months = None, None
+    if last_run:
+        months = fx_bronze_months(bronze_tables, conn, last_run)
+        since = pd.Timestamp(last_run).to_period("M").start_time.isoformat(sep=" ")
+        print(f"  Months with rows after {last_run}: {', '.join(months) or 'none'}")
+        if not months:
+            print("  No new sales data. Skipping.")
+            return
+    elif not any(conn.execute(f'SELECT 1 FROM "{fx_bronze_source(table, conn)[0]}" LIMIT 1').fetchone()
+                 for table in bronze_tables):
+        print("  No new sales data. Skipping.")
+        return
 
-    new_watermark = df_sales["INVOICEDATE"].max().isoformat()
-    set_watermark("silver_sales", new_watermark, "timestamp")
-    print(f"  ✓ SILVER_SALES created — {len(df)} rows. Watermark: {new_watermark}")
+    # Filled while the chunks go through fx_create_table
+    max_dates, rows_per_chunk = [], []
+
+    def fx_silver_chunks():
+        for chunk in fx_stream_bronze_sales(bronze_tables, conn, since, months, chunk_rows):
+            print(f"\n───── Chunk {len(rows_per_chunk) + 1}: {len(chunk)} rows ─────")
+            chunk["INVOICEDATE"] = pd.to_datetime(chunk["INVOICEDATE"], errors="coerce")
+            max_dates.append(chunk["INVOICEDATE"].max())
+            chunk = fx_transform_sales(chunk, conn)
+            rows_per_chunk.append(len(chunk))
+            yield chunk
+
+    # The bronze query only starts with the first chunk, once fx_create_table has dropped or prepared the table
+    with transaction(conn):
+        fx_create_table("SILVER", "SALES", fx_silver_chunks(), SALES_DTYPE_MAPPING, conn,
+                        mode="partition" if last_run else "replace",
+                        indexes=[PARTITION_COLUMN, DATE_KEY_COLUMN, TIMESTAMP_COLUMN], keys=[PARTITION_COLUMN],
+                        dedup_key=FINGERPRINT_COLUMN)
+        new_watermark = pd.Series(max_dates).max().isoformat(sep=" ")
+        set_watermark("silver_sales", new_watermark, "timestamp", conn=conn)
+    print(f"  ✓ SILVER_SALES written — {sum(rows_per_chunk)} rows in {len(rows_per_chunk)} chunks. "
+          f"Watermark: {new_watermark}")
+
+
+## Transform month (process pool worker) ----
+def fx_transform_month(month, bronze_tables, db_path):
+    """Reads and cleans the bronze rows of one invoice month (None: rows without INVOICEDATE) in a worker process,
+    on a read-only connection. Returns the silver rows and the max INVOICEDATE of the month."""
+    conn = get_connection(read_only=True, db_path=db_path)
+    query, params = fx_bronze_sales_query(bronze_tables, conn, months=[month])
+    df = pd.read_sql_query(query, conn, params=params)
+    df = fx_optimize_dtypes(df, string_cols=STRING_COLUMNS + CATEGORICAL_COLUMNS, categorical_cols=())
+    df["INVOICEDATE"] = pd.to_datetime(df["INVOICEDATE"], errors="coerce")
+    return fx_transform_sales(df), df["INVOICEDATE"].max()
+
+
+## Load silver sales on a process pool ----
+def fx_load_silver_sales_parallel(conn, bronze_tables, last_run=None, workers=None):
+    """Parallel version of fx_load_silver_sales: each invoice month is read and cleaned by fx_transform_month in a
+    pool of workers (SILVER_WORKERS by default), and the months are written by this process, in month order.
+    At most two months per worker wait to be written. An incremental run processes the months holding rows after the
+    watermark and replaces these partitions; a full rebuild replaces the table. The table and the watermark commit
+    together, after the last month."""
+    workers = workers or SILVER_WORKERS
+    months = fx_bronze_months(bronze_tables, conn, last_run)
+    print(f"\n───── Transform {len(months)} month(s) on {workers} processes ─────")
+    if not months:
+        print("  No new sales data. Skipping.")
+        return
+
+    # Filled while the months go through fx_create_table
+    max_dates, rows_per_month = [], []
+
+    def fx_written(future, month):
+        df, max_date = future.result()
+        max_dates.append(max_date)
+        rows_per_month.append(len(df))
+        print(f"  Month {month}: {len(df)} rows")
+        return df
+
+    def fx_silver_months():
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            pending = deque()
+            for month in months:
+                pending.append((pool.submit(fx_transform_month, month, bronze_tables, DB_PATH), month))
+                if len(pending) >= 2 * workers:
+                    yield fx_written(*pending.popleft())
+            while pending:
+                yield fx_written(*pending.popleft())
+
+    with transaction(conn):
+        fx_create_table("SILVER", "SALES", fx_silver_months(), SALES_DTYPE_MAPPING, conn,
+                        mode="partition" if last_run else "replace",
+                        indexes=[PARTITION_COLUMN, DATE_KEY_COLUMN, TIMESTAMP_COLUMN], keys=[PARTITION_COLUMN],
+                        dedup_key=FINGERPRINT_COLUMN)
+        new_watermark = pd.Series(max_dates).max().isoformat(sep=" ")
+        set_watermark("silver_sales", new_watermark, "timestamp", conn=conn)
+    print(f"  ✓ SILVER_SALES written — {sum(rows_per_month)} rows in {len(rows_per_month)} months. "
+          f"Watermark: {new_watermark}")
     
     
 # ── Silver RFM Mapping ───────────────────────────────────────────
 
-def fx_load_silver_rfm_mapping(conn):
+def fx_load_silver_rfm_mapping(conn, last_run=None):
     print("\n########### Silver RFM Mapping ###########")
 
-    last_run = get_watermark("silver_rfm_mapping")
-
     # Check if bronze rfm mapping changed
     bronze_mtime = datetime.fromtimestamp(
         conn.execute(
@@ -235,10 +593,10 @@ def fx_load_silver_rfm_mapping(conn):
         "RFM_NAME":    "TEXT"
     }
 
-    fx_create_table("SILVER", "RFM_MAPPING", df, dtype_mapping, conn)
-
-    set_watermark("silver_rfm_mapping",
-                  datetime.now(tz=timezone.utc).isoformat(), "timestamp")
+    with transaction(conn):
+        fx_create_table("SILVER", "RFM_MAPPING", df, dtype_mapping, conn)
+        set_watermark("silver_rfm_mapping",
+                      datetime.now(tz=timezone.utc).isoformat(), "timestamp", conn=conn)
     print(f"  ✓ SILVER_RFM_MAPPING created — {len(df)} rows.")
 
 
@@ -249,8 +607,9 @@ def run():
     try:
         conn = fx_connect_db()
         with conn:
-            fx_load_silver_sales(conn)
-            fx_load_silver_rfm_mapping(conn)
+            watermarks = get_watermarks(["silver_sales", "silver_rfm_mapping"], conn)
+            fx_load_silver_sales(conn, watermarks.get("silver_sales"))
+            fx_load_silver_rfm_mapping(conn, watermarks.get("silver_rfm_mapping"))
 
         print("=" * 50)
         print("Silver layer completed successfully.")
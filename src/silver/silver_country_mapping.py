@@ -26,16 +26,34 @@ Potential improvements:
     - Not determined yet
         
 WARNING:
-    ...
+    API responses are cached in {API_CACHE_DIR}/country_metadata.json (src/utils/response_cache.py), keyed by the
+    normalised country name, for API_CACHE_TTL_DAYS days: a warm run, or a rebuilt database, calls no API.
+    The UTC offset is computed from the cached timezone name at each run.
+    Air-gapped worker: import a snapshot of the cache, then run with API_OFFLINE=1 (cached entries used whatever
+    their age, countries without an entry get NULL metadata):
+        python -m src.utils.response_cache export country_metadata snapshot.json
+        python -m src.utils.response_cache import country_metadata snapshot.json
+
+    Concurrent enrichment: COUNTRY_API_WORKERS threads look up countries at the same time (1 by default).
+    They share one HTTP session (keep-alive, COUNTRY_API_RETRIES retries with backoff on connection errors, 429 and 5xx),
+    one TimezoneFinder and one Nominatim client, and each host has its own rate limit (RATE_LIMITS:
+    RESTCOUNTRIES_RATE_LIMIT per second for restcountries.com, 1 per second for Nominatim).
 """
 
 # 1. Import librairies ----
 print(f"\n########### Import librairies ###########")
+import os
+import threading
+import time
 import pandas as pd
 import requests
 import numpy as np
 import re
 import pytz
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlparse
+from urllib3.util.retry import Retry
 from timezonefinder import TimezoneFinder
 from geopy.geocoders import Nominatim
 from datetime import datetime, timezone
@@ -43,8 +61,28 @@ from datetime import datetime, timezone
 from src.utils.connecting_to_database import fx_connect_db
 from src.utils.create_table import fx_create_table
 from src.utils.export_data_to_xlsx import fx_export_data_to_excel
+from src.utils.db import transaction
+from src.utils.response_cache import API_OFFLINE, cache_get, cache_put, load_cache, save_cache
 from src.utils.watermark import get_watermark, set_watermark
 
+# Response cache of the country metadata APIs (src/utils/response_cache.py), keyed by country name
+CACHE_NAME = "country_metadata"
+
+# Concurrent enrichment: countries looked up at the same time (1 = one after the other)
+API_WORKERS = int(os.environ.get("COUNTRY_API_WORKERS", "1"))
+
+# Requests per second per host (Nominatim usage policy: 1 per second at most)
+RESTCOUNTRIES_HOST = "restcountries.com"
+NOMINATIM_HOST = "nominatim.openstreetmap.org"
+RATE_LIMITS = {
+    RESTCOUNTRIES_HOST: float(os.environ.get("RESTCOUNTRIES_RATE_LIMIT", "10")),
+    NOMINATIM_HOST:     1.0
+}
+
+# Retries of the HTTP session: connection errors, 429 and 5xx, with exponential backoff (0.5 s, 1 s, 2 s)
+API_RETRIES = int(os.environ.get("COUNTRY_API_RETRIES", "3"))
+API_BACKOFF_FACTOR = 0.5
+
 
 
 # ── Country name normalization ───────────────────────────────────
@@ -90,24 +128,94 @@ def fx_resolve_country(raw):
 
 
 
+# ── Shared API clients ───────────────────────────────────────────
+
+# Built once per process and shared by the worker threads
+_CLIENTS = {}
+_CLIENTS_LOCK = threading.Lock()
+_TIMEZONE_LOCK = threading.Lock()
+_RATE_LOCK = threading.Lock()
+_NEXT_SLOT = {}
+
+
+# Fx shared client ----
+def fx_shared_client(name: str, build):
+    """Returns the process-wide client called name, built once with build()."""
+    with _CLIENTS_LOCK:
+        if name not in _CLIENTS:
+            _CLIENTS[name] = build()
+        return _CLIENTS[name]
+
+
+# Fx build session ----
+def fx_build_session() -> requests.Session:
+    """HTTP session with keep-alive connections (one pool slot per worker) and retries with backoff."""
+    retry = Retry(
+        total=API_RETRIES, backoff_factor=API_BACKOFF_FACTOR,
+        status_forcelist=[429, 500, 502, 503, 504], allowed_methods=["GET"]
+    )
+    adapter = HTTPAdapter(max_retries=retry, pool_maxsize=max(API_WORKERS, 1))
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+# Fx wait rate limit ----
+def fx_wait_rate_limit(host: str):
+    """Waits for the next request slot of a host (RATE_LIMITS): slots are booked under a lock, the wait is not."""
+    rate = RATE_LIMITS.get(host)
+    if not rate:
+        return
+    with _RATE_LOCK:
+        now = time.monotonic()
+        slot = max(now, _NEXT_SLOT.get(host, now))
+        _NEXT_SLOT[host] = slot + 1 / rate
+    time.sleep(max(0.0, slot - now))
+
+
+# Fx HTTP get ----
+def fx_http_get(url: str, **kwargs) -> requests.Response:
+    """GET through the shared session, within the rate limit of the host."""
+    fx_wait_rate_limit(urlparse(url).hostname)
+    return fx_shared_client("session", fx_build_session).get(url, **kwargs)
+
+
+# Fx timezone at ----
+def fx_timezone_at(latitude, longitude) -> str | None:
+    """Timezone name at a point, with the process-wide TimezoneFinder (expensive to build, read under a lock)."""
+    tf = fx_shared_client("timezone_finder", TimezoneFinder)
+    with _TIMEZONE_LOCK:
+        return tf.timezone_at(lat=latitude, lng=longitude)
+
+
+# Fx geocode ----
+def fx_geocode(query: str):
+    """Geocodes a place with the process-wide Nominatim client, within the Nominatim rate limit."""
+    geolocator = fx_shared_client("geocoder", lambda: Nominatim(user_agent="timezone_finder"))
+    fx_wait_rate_limit(NOMINATIM_HOST)
+    return geolocator.geocode(query)
+
+
+
+
+
 # ── API call ─────────────────────────────────────────────────────
 
-# Fx API Metadata ----
-def fx_get_metadata(country_name: str) -> dict:
-    country_name = EXCEPTION_MAP_METADATA.get(country_name, country_name)
+# Fx fetch metadata ----
+def fx_fetch_metadata(country_name: str) -> dict | None:
+    """Calls restcountries.com (and Nominatim when the country has no coordinates) for one country.
+    Returns the metadata with the timezone name, or None on API error."""
     url = f"https://restcountries.com/v3.1/name/{country_name}"
     params = {"fields": "region,capital,cca3,currencies,latlng"}
 
     try:
-        r = requests.get(url, params=params, timeout=10)
+        r = fx_http_get(url, params=params, timeout=10)
         r.raise_for_status()
         data = r.json()[0]
     except Exception:
         print(f"  ✗ API error for: {country_name}")
-        return {
-            "CONTINENT": None, "CAPITAL": None,
-            "ISO3": None, "CURRENCY": None, "TIMEZONE": None
-        }
+        return None
 
     currencies   = data.get("currencies", {})
     currency_code = next(iter(currencies.keys()), None)
@@ -117,31 +225,62 @@ def fx_get_metadata(country_name: str) -> dict:
     capital      = (data.get("capital") or [None])[0]
 
     timezone_str = None
-    tf = TimezoneFinder()
     if latitude is not None and longitude is not None:
-        timezone_str = tf.timezone_at(lat=latitude, lng=longitude)
+        timezone_str = fx_timezone_at(latitude, longitude)
     elif capital:
-        geolocator = Nominatim(user_agent="timezone_finder")
-        location = geolocator.geocode(capital)
+        location = fx_geocode(capital)
         if location:
-            timezone_str = tf.timezone_at(
-                lat=location.latitude, lng=location.longitude
-            )
-
-    utc_offset = None
-    if timezone_str:
-        try:
-            tz = pytz.timezone(timezone_str)
-            utc_offset = datetime.now(tz).strftime('%z')
-        except Exception:
-            utc_offset = None
+            timezone_str = fx_timezone_at(location.latitude, location.longitude)
 
     return {
-        "CONTINENT": data.get("region"),
-        "CAPITAL":   capital,
-        "ISO3":      data.get("cca3"),
-        "CURRENCY":  currency_code,
-        "TIMEZONE":  utc_offset
+        "CONTINENT":     data.get("region"),
+        "CAPITAL":       capital,
+        "ISO3":          data.get("cca3"),
+        "CURRENCY":      currency_code,
+        "TIMEZONE_NAME": timezone_str
+    }
+
+
+# Fx UTC offset ----
+def fx_utc_offset(timezone_str: str | None) -> str | None:
+    """Current UTC offset (+HHMM) of a timezone name, computed at each run (daylight saving time changes it)."""
+    if not timezone_str:
+        return None
+    try:
+        tz = pytz.timezone(timezone_str)
+        return datetime.now(tz).strftime('%z')
+    except Exception:
+        return None
+
+
+# Fx API Metadata ----
+def fx_get_metadata(country_name: str, cache: dict = None) -> dict:
+    """Metadata of one country, from the response cache when it holds a fresh entry (no HTTP call).
+    Otherwise the APIs are called and the response cached. Offline (API_OFFLINE=1) or on API error,
+    an expired cache entry is used rather than no metadata."""
+    country_name = EXCEPTION_MAP_METADATA.get(country_name, country_name)
+
+    metadata = cache_get(cache, country_name) if cache is not None else None
+    if metadata is None and not API_OFFLINE:
+        metadata = fx_fetch_metadata(country_name)
+        if metadata is not None and cache is not None:
+            cache_put(cache, country_name, metadata)
+    if metadata is None and cache is not None:
+        metadata = cache_get(cache, country_name, allow_stale=True)
+
+    if metadata is None:
+        print(f"  ✗ No metadata for: {country_name}")
+        return {
+            "CONTINENT": None, "CAPITAL": None,
+            "ISO3": None, "CURRENCY": None, "TIMEZONE": None
+        }
+
+    return {
+        "CONTINENT": metadata["CONTINENT"],
+        "CAPITAL":   metadata["CAPITAL"],
+        "ISO3":      metadata["ISO3"],
+        "CURRENCY":  metadata["CURRENCY"],
+        "TIMEZONE":  fx_utc_offset(metadata["TIMEZONE_NAME"])
     }
 
 
@@ -166,7 +305,7 @@ def fx_get_existing_countries(conn) -> set:
 def fx_load_silver_country_mapping(conn):
     print("\n########### Silver Country Mapping ###########")
 
-    last_run = get_watermark("silver_country_mapping")
+    last_run = get_watermark("silver_country_mapping", conn)
 
     # Get distinct countries from SILVER_SALES
     df_country = pd.read_sql_query(
@@ -193,33 +332,26 @@ def fx_load_silver_country_mapping(conn):
         )
     )
 
-    # API calls — only for new countries
+    # API calls — only for new countries missing from the response cache (or expired)
     countries = df_new["COUNTRY_STANDARDIZED"].dropna().unique()
-    print(f"  Calling API for {len(countries)} country/ies...")
-    metadata = [fx_get_metadata(c) for c in countries]
+    cache = load_cache(CACHE_NAME)
+    lookups = {EXCEPTION_MAP_METADATA.get(c, c) for c in countries}
+    cached = sum(cache_get(cache, name) is not None for name in lookups)
+    print(f"  Metadata for {len(countries)} country/ies ({len(lookups)} lookups): {cached} from cache, "
+          f"{'none called (offline mode)' if API_OFFLINE else f'{len(lookups) - cached} from the API'}")
+    # Lookups run on API_WORKERS threads: a batch takes about as long as its slowest lookup, not their sum
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(API_WORKERS, 1)) as pool:
+        metadata = list(pool.map(lambda country: fx_get_metadata(country, cache), countries))
+    print(f"  Metadata resolved in {time.perf_counter() - start:.1f}s on {max(API_WORKERS, 1)} thread(s)")
+    save_cache(CACHE_NAME, cache)
 
     df_metadata = pd.DataFrame(metadata)
     df_metadata["COUNTRY_STANDARDIZED"] = countries
 
     df_new = df_new.merge(df_metadata, on="COUNTRY_STANDARDIZED", how="left")
 
-    # If table already exists, append new rows instead of dropping
-    if existing_countries:
-        df_existing = pd.read_sql_query(
-            'SELECT * FROM "SILVER_COUNTRY_METADATA"', conn
-        )
-        df_final = pd.concat([df_existing, df_new], ignore_index=True)
-    else:
-        df_final = df_new
-
-    # Export to Excel for exploration
-    fx_export_data_to_excel(
-        {"Country Mapping": df_final},
-        "silver_country_mapping",
-        "data_exploration"
-    )
-
-    # Save to database
+    # Save to database — only the new countries are written, merged on COUNTRY_RAW
     dtype_mapping = {
         "COUNTRY_RAW":          "TEXT",
         "COUNTRY_STANDARDIZED": "TEXT",
@@ -231,10 +363,21 @@ def fx_load_silver_country_mapping(conn):
         "TIMEZONE":             "TEXT"
     }
 
-    fx_create_table("SILVER", "COUNTRY_METADATA", df_final, dtype_mapping, conn)
+    # The merge and the watermark commit together
+    with transaction(conn):
+        fx_create_table("SILVER", "COUNTRY_METADATA", df_new, dtype_mapping, conn,
+                        mode="merge", keys=["COUNTRY_RAW"])
+        set_watermark("silver_country_mapping",
+                      datetime.now(tz=timezone.utc).isoformat(), "timestamp", conn=conn)
+
+    # Export to Excel for exploration (whole table)
+    df_final = pd.read_sql_query('SELECT * FROM "SILVER_COUNTRY_METADATA"', conn)
+    fx_export_data_to_excel(
+        {"Country Mapping": df_final},
+        "silver_country_mapping",
+        "data_exploration"
+    )
 
-    set_watermark("silver_country_mapping",
-                  datetime.now(tz=timezone.utc).isoformat(), "timestamp")
     print(f"  ✓ SILVER_COUNTRY_METADATA — {len(df_final)} rows total "
           f"({len(df_new)} new).")
 
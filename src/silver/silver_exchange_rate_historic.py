@@ -42,6 +42,7 @@ from forex_python.converter import RatesNotAvailableError
 from src.utils.connecting_to_database import fx_connect_db
 from src.utils.create_table import fx_create_table
 from src.utils.export_data_to_xlsx import fx_export_data_to_excel
+from src.utils.db import transaction
 from src.utils.watermark import get_watermark, set_watermark
 
 
@@ -93,7 +94,7 @@ def fx_get_existing_pairs(conn) -> set:
 def fx_load_silver_exchange_rate(conn):
     print("\n########### Silver Exchange Rate ###########")
 
-    last_run = get_watermark("silver_exchange_rate")
+    last_run = get_watermark("silver_exchange_rate", conn)
 
     ## Get unique country/date pairs from SILVER_SALES ----
     df_sales = pd.read_sql_query(
@@ -163,33 +164,27 @@ def fx_load_silver_exchange_rate(conn):
         for m in missing_fx:
             print(f"    {m['DATE']} / {m['CURRENCY']}")
 
-    # Merge new pairs with existing data ----
-    if existing_pairs:
-        df_existing = pd.read_sql_query(
-            'SELECT * FROM "SILVER_EXCHANGE_RATE"', conn
-        )
-        df_final = pd.concat([df_existing, df_new_pairs], ignore_index=True)
-    else:
-        df_final = df_new_pairs
+    # Save to database — only the new pairs are written, merged on (INVOICE_DATE, CURRENCY) ----
+    dtype_mapping = {
+        "INVOICE_DATE":        "TEXT",
+        "CURRENCY":            "TEXT",
+        "EXCHANGE_RATE_TO_GBP": "REAL"
+    }
+    # The merge and the watermark (max invoice date processed) commit together
+    new_watermark = df_new_pairs["INVOICE_DATE"].max()
+    with transaction(conn):
+        fx_create_table("SILVER", "EXCHANGE_RATE", df_new_pairs, dtype_mapping, conn,
+                        mode="merge", keys=["INVOICE_DATE", "CURRENCY"])
+        set_watermark("silver_exchange_rate", new_watermark, "timestamp", conn=conn)
 
-    # Export to Excel ----
+    # Export to Excel (whole table) ----
+    df_final = pd.read_sql_query('SELECT * FROM "SILVER_EXCHANGE_RATE"', conn)
     fx_export_data_to_excel(
         {"Date Exchange Rate": df_final},
         "silver_pair_currency_date",
         "data_exploration"
     )
 
-    # Save to database ----
-    dtype_mapping = {
-        "INVOICE_DATE":        "TEXT",
-        "CURRENCY":            "TEXT",
-        "EXCHANGE_RATE_TO_GBP": "REAL"
-    }
-    fx_create_table("SILVER", "EXCHANGE_RATE", df_final, dtype_mapping, conn)
-
-    # Watermark = max invoice date processed ----
-    new_watermark = df_new_pairs["INVOICE_DATE"].max()
-    set_watermark("silver_exchange_rate", new_watermark, "timestamp")
     print(f"  ✓ SILVER_EXCHANGE_RATE — {len(df_final)} rows total "
           f"({len(df_new_pairs)} new). Watermark: {new_watermark}")
 
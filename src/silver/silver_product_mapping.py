@@ -35,6 +35,7 @@ from datetime import datetime, timezone
 from src.utils.connecting_to_database import fx_connect_db
 from src.utils.create_table import fx_create_table
 from src.utils.export_data_to_xlsx import fx_export_data_to_excel
+from src.utils.db import transaction
 from src.utils.watermark import get_watermark, set_watermark
 
 
@@ -292,23 +293,26 @@ def fx_load_silver_product_mapping(conn):
     print(f"\n  Final: {df_product['PRODUCT_NAME'].nunique()} unique product names")
 
 
-    # ── Merge with existing if needed ─────────────────────────────
-    ## Merge with existing if needed ----
-    if existing_stockcodes:
-        df_existing = pd.read_sql_query(
-            'SELECT * FROM "SILVER_PRODUCT_MAPPING"', conn
-        )
-        df_final = (
-            pd.concat([df_existing, df_product], ignore_index=True)
-            .drop_duplicates()
-            .sort_values(["STOCKCODE", "PRODUCT_NAME"])
-        )
-    else:
-        df_final = df_product
+    # ── Save to database ──────────────────────────────────────────
+    ## Save to database — merged on (STOCKCODE, DESCRIPTION_RAW), only new or renamed products are written ----
+    dtype_mapping = {
+        "STOCKCODE":       "TEXT",
+        "DESCRIPTION_RAW": "TEXT",
+        "PRODUCT_NAME":    "TEXT"
+    }
+    # The merge and the watermark commit together
+    with transaction(conn):
+        fx_create_table("SILVER", "PRODUCT_MAPPING", df_product, dtype_mapping, conn,
+                        mode="merge", keys=["STOCKCODE", "DESCRIPTION_RAW"])
+        set_watermark("silver_product_mapping",
+                      datetime.now(tz=timezone.utc).isoformat(), "timestamp", conn=conn)
 
 
     # ── Exploration export ────────────────────────────────────────
-    ## Exploration export ----
+    ## Exploration export (whole table) ----
+    df_final = pd.read_sql_query(
+        'SELECT * FROM "SILVER_PRODUCT_MAPPING" ORDER BY STOCKCODE, PRODUCT_NAME', conn
+    )
     df_count, df_multi_product, df_multi_code = fx_build_exploration_dfs(df_final)
 
     fx_export_data_to_excel(
@@ -322,18 +326,6 @@ def fx_load_silver_product_mapping(conn):
         "data_exploration"
     )
 
-
-    # ── Save to database ──────────────────────────────────────────
-    ## Save to database ----
-    dtype_mapping = {
-        "STOCKCODE":       "TEXT",
-        "DESCRIPTION_RAW": "TEXT",
-        "PRODUCT_NAME":    "TEXT"
-    }
-    fx_create_table("SILVER", "PRODUCT_MAPPING", df_final, dtype_mapping, conn)
-
-    set_watermark("silver_product_mapping",
-                  datetime.now(tz=timezone.utc).isoformat(), "timestamp")
     print(f"  ✓ SILVER_PRODUCT_MAPPING — {len(df_final)} rows total "
           f"({len(df_product)} new).")
 
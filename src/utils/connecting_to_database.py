@@ -20,13 +20,12 @@ WARNING:
 """
 
 # 1. Import librairies ----
-import sqlite3
-from src.utils.db import DB_PATH
+from src.utils.db import DB_PATH, get_connection
 
-def fx_connect_db():
-    conn = sqlite3.connect(DB_PATH)
-    conn.execute("PRAGMA journal_mode=WAL")
+def fx_connect_db(read_only: bool = False):
+    """Returns the shared, tuned connection of this process (read_only=True for analytical readers)."""
+    conn = get_connection(read_only=read_only)
     print("=" * 50)
-    print(f"Database connected at: {DB_PATH}")
+    print(f"Database connected at: {DB_PATH}{' (read-only)' if read_only else ''}")
     print("=" * 50)
     return conn
\ No newline at end of file
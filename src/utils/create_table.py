@@ -29,46 +29,420 @@ Exemple of use:
 
     create_silver_exchange_rate = fx_create_table('SILVER', 'EXCHANGE_RATE', df_exchange_rate, dtype_mapping, conn)
 
+    Nothing is committed: the table is written in the caller's transaction, so a stage can commit it with its watermark
+    (with transaction(conn): ... set_watermark(..., conn=conn), see src/utils/db.py).
+
+    The df argument can also be an iterable (e.g. a generator) of dataframes sharing the same columns:
+    the table is created once and each chunk is inserted in turn, so the full data never sits in memory.
+
+Bulk-load mode (bulk=True, or SQLITE_BULK_LOAD=1 for every call):
+    - the connection is tuned for the load (synchronous=NORMAL, and cache_size / temp_store if BULK_CACHE_SIZE_KB / BULK_TEMP_STORE are set)
+    - rows are inserted with prepared multi-row statements (one row per statement otherwise)
+    - the indexes given with indexes=[...] (column names, or tuples of names) are built after the data is in
+    Benchmark: python -m src.benchmarks.bench_create_table
+
+Write modes:
+    - "replace" (default): drop the table and create it again with the new data
+    - "append": keep the existing rows and add the new data as a batch, tagged with INGEST_BATCH_ID (previous max + 1)
+      and INGESTED_AT (UTC timestamp). The table gets an index on INGEST_BATCH_ID and a {table}_LATEST view
+      returning the last batch only. Columns missing from the existing table are added.
+    - "merge": upsert on the key columns given with keys=[...]: the table is kept, a unique index is created on the keys
+      (existing duplicates removed first), new keys are inserted and existing keys updated only when a value changed
+      (INSERT ... ON CONFLICT DO UPDATE ... WHERE). The write cost follows the delta, callers only pass new or changed rows.
+      Rows with a NULL key cannot be merged and are skipped.
+    - "partition": the key columns given with keys=[...] are a partition key (e.g. INVOICE_MONTH): each partition present
+      in the new data is deleted from the table, then the new rows are inserted. The other partitions are not touched,
+      so a run only rewrites the partitions it brings. Pass the partition key in indexes=[...] too, so the deletes
+      and the readers filtering on it use an index.
+    - "swap": build the new data and its indexes in a _STAGING_{table} table, then DROP the live table and RENAME
+      the staging one in a short transaction. Readers keep the previous version until the swap (WAL journal),
+      instead of a missing or half-filled table during the rebuild.
+      Without an open transaction, the staging build is committed first, so the swap holds the write lock for milliseconds.
+
+Deduplication (dedup_key="COLUMN", replace, append and partition modes):
+    The column (e.g. a row fingerprint) gets a unique index, and each chunk is anti-joined against the table before
+    it is inserted: rows whose key is already in the table (history, or an earlier chunk of the same write) and
+    repeated keys within the chunk are skipped. The lookups go through the unique index, so the cost follows the
+    chunk size, not the table size. In partition mode, the replaced partitions are deleted before the anti-join:
+    their history is never matched, only the kept partitions and the earlier chunks of the write are.
+
 """
 
 # 1. Import librairies ----
+import os
 import re
+import sqlite3
+import time
+import pandas as pd
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
 from src.utils.connecting_to_database import fx_connect_db
 
+# Columns added to every table written in "append" mode
+BATCH_ID_COLUMN = "INGEST_BATCH_ID"
+INGESTED_AT_COLUMN = "INGESTED_AT"
+
+# Prefix of the staging tables of the "swap" mode (outside the BRONZE_/SILVER_/GOLD_ name patterns)
+STAGING_PREFIX = "_STAGING_"
+
+# Write mode of the gold tables (gold layer, RFM scoring, CLTV). "swap" (default): rebuilt in a staging table
+# and swapped in, PowerBI never sees a missing table
+GOLD_WRITE_MODE = os.environ.get("GOLD_WRITE_MODE", "swap")
+
+# Bulk-load mode (default of the bulk argument), optional PRAGMAs during a bulk load, rows converted at once
+BULK_LOAD = os.environ.get("SQLITE_BULK_LOAD", "0") == "1"
+BULK_CACHE_SIZE_KB = int(os.environ.get("BULK_CACHE_SIZE_KB", "0"))        # 0 keeps the connection cache_size
+BULK_TEMP_STORE = os.environ.get("BULK_TEMP_STORE", "DEFAULT").upper()     # DEFAULT (unchanged), FILE or MEMORY
+BULK_SLICE_ROWS = 100_000
+
+# Multi-row inserts and IN lookups: bound parameters per statement when the connection cannot tell its own limit
+# (999 before SQLite 3.32), and rows per multi-row statement
+SQLITE_DEFAULT_MAX_VARIABLES = 999
+MULTI_ROW_MAX_ROWS = 500
+
+
+# 2. Create fx_frame_rows function ----
+def fx_frame_rows(df):
+    """Returns the dataframe rows as tuples of plain Python values (None for nulls, text for timestamps),
+    ready to be bound to a prepared INSERT statement. Columns are converted whole (tolist), not cell by cell."""
+    columns = []
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_datetime64_any_dtype(series):
+            series = series.map(lambda x: x.isoformat(" "), na_action="ignore")
+        nulls = series.isna().to_numpy()
+        if nulls.any():
+            values = series.to_numpy(dtype=object, copy=True)
+            values[nulls] = None
+        else:
+            values = series.to_numpy()
+        columns.append(values.tolist())
+    return list(zip(*columns))
+
+
+# 3. Create fx_bulk_load_pragmas function ----
+@contextmanager
+def fx_bulk_load_pragmas(conn):
+    """Tunes the connection for a bulk load:
+    - synchronous=NORMAL: no fsync on every commit (safe with the WAL journal, a crash can only lose the last commits).
+      It applies when the caller commits and SQLite refuses to change it inside a transaction,
+      so it is set when no transaction is open yet and kept for the rest of the connection.
+    - cache_size (BULK_CACHE_SIZE_KB) and temp_store (BULK_TEMP_STORE), only when set, restored afterwards.
+      Off by default: on the benchmark host, a larger cache and in-memory sorts made the load and the index builds slower,
+      check them with src/benchmarks/bench_create_table.py on the target machine before turning them on."""
+    if not conn.in_transaction:
+        conn.execute("PRAGMA synchronous = NORMAL")
 
-# 2. Create fx_create_table function ----
-def fx_create_table(layer_name, table_name, df, dtype_mapping, conn):
+    pragmas = {}
+    if BULK_CACHE_SIZE_KB:
+        pragmas["cache_size"] = -BULK_CACHE_SIZE_KB
+    if BULK_TEMP_STORE != "DEFAULT":
+        pragmas["temp_store"] = BULK_TEMP_STORE
+    previous = {name: conn.execute(f"PRAGMA {name}").fetchone()[0] for name in pragmas}
+    for name, value in pragmas.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+    try:
+        yield conn
+    finally:
+        for name, value in previous.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+
+
+# 4. Create fx_max_variables function ----
+def fx_max_variables(conn):
+    """Returns the number of bound parameters allowed per statement by the SQLite library of the connection
+    (read with getlimit, Python >= 3.11), or SQLITE_DEFAULT_MAX_VARIABLES when it cannot be read."""
+    try:
+        return conn.getlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER)
+    except AttributeError:
+        return SQLITE_DEFAULT_MAX_VARIABLES
+
+
+## Create fx_insert_chunk function ----
+def fx_insert_chunk(cursor, full_name, chunk, multi_row=False):
+    """Inserts a dataframe chunk with a prepared statement and executemany.
+    multi_row: each statement inserts several rows (VALUES (...), (...), ...), up to the SQLite variable limit,
+    which divides the per-statement overhead by the number of rows per statement."""
+    cols = ", ".join(chunk.columns)
+    row_sql = "(" + ", ".join("?" * len(chunk.columns)) + ")"
+    rows = fx_frame_rows(chunk)
+
+    max_variables = fx_max_variables(cursor.connection)
+    rows_per_statement = max(1, min(MULTI_ROW_MAX_ROWS, max_variables // max(len(chunk.columns), 1))) if multi_row else 1
+    full_groups = len(rows) // rows_per_statement
+    if rows_per_statement > 1 and full_groups:
+        statement = f"INSERT INTO {full_name} ({cols}) VALUES " + ", ".join([row_sql] * rows_per_statement)
+        values = [value for row in rows[:full_groups * rows_per_statement] for value in row]
+        step = rows_per_statement * len(chunk.columns)
+        cursor.executemany(statement, (values[start:start + step] for start in range(0, len(values), step)))
+        rows = rows[full_groups * rows_per_statement:]
+    if rows:
+        cursor.executemany(f"INSERT INTO {full_name} ({cols}) VALUES {row_sql}", rows)
+    return len(chunk)
+
+
+# 5. Create fx_create_table function ----
+def fx_create_table(layer_name, table_name, df, dtype_mapping, conn, mode="replace", bulk=BULK_LOAD, indexes=None, keys=None,
+                    dedup_key=None):
     
     layer_name = re.sub(r'\W+', '_', layer_name.upper().strip())
     table_name = re.sub(r'\W+', '_', table_name.upper().strip())
     full_name = f"{layer_name}_{table_name}"
 
-    print(f"\n########### Creating {full_name} table ###########")
-    
-    # Drop existing table if exists
+    print(f"\n########### Creating {full_name} table ({mode}{', bulk' if bulk else ''}) ###########")
+
+    if mode == "swap":
+        if dedup_key:
+            raise ValueError(f"Swap mode does not support dedup_key (writing {full_name})")
+        # Readers keep the live table while the data and indexes go into a staging table
+        outer_transaction = conn.in_transaction
+        staging_name = f"{STAGING_PREFIX}{full_name}"
+        index_names = fx_index_names(full_name, indexes, conn)
+        with (fx_bulk_load_pragmas(conn) if bulk else nullcontext(conn)):
+            rows_inserted = fx_write_table(staging_name, df, dtype_mapping, conn, "replace", bulk)
+            fx_create_indexes(staging_name, indexes, index_names, conn)
+        if not outer_transaction:
+            conn.commit()
+        fx_swap_table(staging_name, full_name, conn, commit=not outer_transaction)
+        print(f"\n  Inserted {rows_inserted} rows")
+        return full_name
+
+    with (fx_bulk_load_pragmas(conn) if bulk else nullcontext(conn)):
+        rows_inserted = fx_write_table(full_name, df, dtype_mapping, conn, mode, bulk, keys, dedup_key)
+
+        # Indexes are built once the data is in: one sort instead of a B-tree update per inserted row
+        fx_create_indexes(full_name, indexes, fx_index_names(full_name, indexes), conn)
+
+    print(f"\n  {'Inserted or updated' if mode == 'merge' else 'Inserted'} {rows_inserted} rows")
+
+    return full_name
+
+
+## Create fx_index_names function ----
+def fx_index_names(full_name, indexes, conn=None):
+    """Returns the index name of each index (column name or tuple of names) of a table.
+    With a connection (swap mode), a name already used by the live table gets the other suffix,
+    so the staging indexes never collide with the live ones and the names alternate between builds."""
+    existing = set()
+    if conn is not None:
+        existing = {row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ?", (full_name,)
+        )}
+    names = []
+    for index_cols in indexes or []:
+        index_cols = [index_cols] if isinstance(index_cols, str) else list(index_cols)
+        name = f"IDX_{full_name}_{'_'.join(index_cols)}"
+        names.append(f"{name}_B" if name in existing else name)
+    return names
+
+
+## Create fx_create_indexes function ----
+def fx_create_indexes(table, indexes, index_names, conn):
+    for index_cols, index_name in zip(indexes or [], index_names):
+        index_cols = [index_cols] if isinstance(index_cols, str) else list(index_cols)
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} ({', '.join(index_cols)})")
+        print(f"  Index created: {index_name}")
+
+
+## Create fx_swap_table function ----
+def fx_swap_table(staging_name, full_name, conn, commit=True):
+    """Replaces the live table by the staging table in one short transaction: DROP the live table, RENAME the staging one.
+    legacy_alter_table=ON keeps RENAME from re-checking the views that point to the live table while it is dropped:
+    they keep their definition and read the new table once it has the live name.
+    With commit=False (the caller has an open transaction), the swap is part of the caller's transaction."""
+    legacy_alter_table = conn.execute("PRAGMA legacy_alter_table").fetchone()[0]
+    conn.execute("PRAGMA legacy_alter_table = ON")
+    try:
+        start = time.perf_counter()
+        if commit:
+            conn.execute("BEGIN IMMEDIATE")
+        conn.execute(f"DROP TABLE IF EXISTS {full_name}")
+        conn.execute(f"ALTER TABLE {staging_name} RENAME TO {full_name}")
+        if commit:
+            conn.commit()
+        print(f"\n  Swapped {staging_name} -> {full_name} in {(time.perf_counter() - start) * 1000:.1f} ms")
+    except Exception:
+        if commit:
+            conn.rollback()
+        raise
+    finally:
+        conn.execute(f"PRAGMA legacy_alter_table = {legacy_alter_table}")
+
+
+## Create fx_write_table function ----
+def fx_write_table(full_name, df, dtype_mapping, conn, mode, bulk, keys=None, dedup_key=None):
+    """Drops/creates (or extends in append and merge modes) the table and inserts the data.
+    Returns the number of rows inserted (inserted or updated in merge mode)."""
     cursor = conn.cursor()
-    cursor.execute(f"DROP TABLE IF EXISTS {full_name}")
-    print(f"\n  Dropped existing table (if any): {full_name}")
+
+    if mode in ("merge", "partition"):
+        if not keys:
+            raise ValueError(f"{mode.capitalize()} mode needs key columns to write {full_name}")
+    elif mode == "append":
+        # Keep the history: the table is only created once, each load is a new batch
+        dtype_mapping = {**dtype_mapping, BATCH_ID_COLUMN: "INTEGER", INGESTED_AT_COLUMN: "TEXT"}
+    else:
+        # Drop existing table if exists
+        cursor.execute(f"DROP VIEW IF EXISTS {full_name}_LATEST")
+        cursor.execute(f"DROP TABLE IF EXISTS {full_name}")
+        print(f"\n  Dropped existing table (if any): {full_name}")
 
     # Create sql statement
     print(f"\n───── Concatenating SQL statement ─────")
     cols_sql = ", ".join([f"{col} {dtype}" for col, dtype in dtype_mapping.items()])
-    sql_statement = f"CREATE TABLE {full_name} ({cols_sql})"
+    sql_statement = f"CREATE TABLE IF NOT EXISTS {full_name} ({cols_sql})"
     print(f"\n  SQL: {sql_statement}")
 
     # Create table
     cursor.execute(sql_statement)
     print(f"\n  Table created: {full_name}")
 
+    if mode in ("append", "merge", "partition"):
+        ### Columns new to an existing table (or batch columns of a table created in replace mode) ----
+        existing_cols = {row[1] for row in cursor.execute(f"PRAGMA table_info({full_name})")}
+        for col, dtype in dtype_mapping.items():
+            if col not in existing_cols:
+                cursor.execute(f"ALTER TABLE {full_name} ADD COLUMN {col} {dtype}")
+                print(f"  Added column: {col} {dtype}")
+
+    if dedup_key and mode != "merge":
+        fx_create_unique_key(full_name, [dedup_key], conn)
+
+    if mode == "merge":
+        fx_create_unique_key(full_name, keys, conn)
+        rows_merged = 0
+        for chunk in ([df] if isinstance(df, pd.DataFrame) else df):
+            rows_merged += fx_merge_chunk(cursor, full_name, chunk, keys)
+        return rows_merged
+
+    if mode == "append":
+        ### Batch index and latest batch view ----
+        # MAX(INGEST_BATCH_ID) and the batch filter are index lookups, whatever the history size
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS IDX_{full_name}_{BATCH_ID_COLUMN} ON {full_name} ({BATCH_ID_COLUMN})"
+        )
+        cursor.execute(f"""
+            CREATE VIEW IF NOT EXISTS {full_name}_LATEST AS
+            SELECT * FROM {full_name}
+            WHERE {BATCH_ID_COLUMN} = (SELECT MAX({BATCH_ID_COLUMN}) FROM {full_name})
+        """)
+
+        batch_id = cursor.execute(
+            f"SELECT COALESCE(MAX({BATCH_ID_COLUMN}), 0) + 1 FROM {full_name}"
+        ).fetchone()[0]
+        batch_cols = {BATCH_ID_COLUMN: batch_id, INGESTED_AT_COLUMN: datetime.now(tz=timezone.utc).isoformat()}
+        print(f"\n  Appending batch {batch_id}")
+
+        if isinstance(df, pd.DataFrame):
+            df = df.assign(**batch_cols)
+        else:
+            df = (chunk.assign(**batch_cols) for chunk in df)
+
+    if mode == "partition":
+        ### Partitions of the new data are replaced, the others kept ----
+        replaced = set()
+        rows_inserted = 0
+        for chunk in ([df] if isinstance(df, pd.DataFrame) else df):
+            fx_delete_partitions(cursor, full_name, chunk, keys, replaced)
+            if dedup_key:
+                chunk = fx_drop_existing_keys(cursor, full_name, chunk, dedup_key)
+            rows_inserted += fx_insert_chunk(cursor, full_name, chunk, multi_row=bulk)
+        print(f"\n  Replaced {len(replaced)} partition(s) on {', '.join(keys)}")
+        return rows_inserted
+
     # Insert data
-    df.to_sql(
-        name=full_name,
-        con=conn,
-        if_exists="append",
-        index=False
-    )
+    # Iterable of dataframes (or slices of the dataframe): one prepared statement, each chunk inserted with
+    # executemany (multi-row statements in bulk mode). Nothing is committed here: the caller's transaction stays open,
+    # so the table and the watermark describing it can commit together
+    chunks = df
+    if isinstance(df, pd.DataFrame):
+        chunks = (df.iloc[start:start + BULK_SLICE_ROWS] for start in range(0, len(df), BULK_SLICE_ROWS))
+    rows_inserted = 0
+    for chunk in chunks:
+        if dedup_key:
+            chunk = fx_drop_existing_keys(cursor, full_name, chunk, dedup_key)
+        rows_inserted += fx_insert_chunk(cursor, full_name, chunk, multi_row=bulk)
+    return rows_inserted
+
+
+## Create fx_delete_partitions function ----
+def fx_delete_partitions(cursor, full_name, chunk, keys, replaced):
+    """Deletes the rows of the partitions found in a chunk, unless an earlier chunk of the same write
+    already replaced them (set replaced, updated in place). IS matches a NULL partition too."""
+    where_sql = " AND ".join(f"{key} IS ?" for key in keys)
+    partitions = [
+        partition for partition in dict.fromkeys(fx_frame_rows(chunk[keys].drop_duplicates()))
+        if partition not in replaced
+    ]
+    if partitions:
+        cursor.executemany(f"DELETE FROM {full_name} WHERE {where_sql}", partitions)
+        replaced.update(partitions)
+
 
-    rows_inserted = len(df)
-    print(f"\n  Inserted {rows_inserted} rows")
+## Create fx_drop_existing_keys function ----
+def fx_drop_existing_keys(cursor, full_name, chunk, dedup_key):
+    """Anti-join of a chunk against the table on its unique dedup_key column: drops the repeated keys of the chunk
+    and the rows whose key is already in the table, looked up through the unique index."""
+    chunk = chunk.drop_duplicates(subset=[dedup_key])
+    chunk_keys = chunk[dedup_key].dropna().tolist()
+    existing = set()
+    max_variables = fx_max_variables(cursor.connection)
+    for start in range(0, len(chunk_keys), max_variables):
+        batch = chunk_keys[start:start + max_variables]
+        existing.update(row[0] for row in cursor.execute(
+            f"SELECT {dedup_key} FROM {full_name} WHERE {dedup_key} IN ({', '.join('?' * len(batch))})", batch
+        ))
+    if existing:
+        chunk = chunk[~chunk[dedup_key].isin(existing)]
+        print(f"  Skipped {len(existing)} row(s) already in {full_name} ({dedup_key})")
+    return chunk
 
-    return full_name
\ No newline at end of file
+
+## Create fx_create_unique_key function ----
+def fx_create_unique_key(full_name, keys, conn):
+    """Creates the unique index the merge mode relies on. A table written before (with duplicate keys)
+    is deduplicated first, keeping the last inserted row of each key."""
+    index_name = f"UX_{full_name}_{'_'.join(keys)}"
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (index_name,)
+    ).fetchone()
+    if exists:
+        return
+    keys_sql = ", ".join(keys)
+    deleted = conn.execute(f"""
+        DELETE FROM {full_name}
+        WHERE rowid NOT IN (SELECT MAX(rowid) FROM {full_name} GROUP BY {keys_sql})
+    """).rowcount
+    if deleted:
+        print(f"  Removed {deleted} duplicate key row(s) before creating the unique key")
+    conn.execute(f"CREATE UNIQUE INDEX {index_name} ON {full_name} ({keys_sql})")
+    print(f"  Unique key created: {index_name}")
+
+
+## Create fx_merge_chunk function ----
+def fx_merge_chunk(cursor, full_name, chunk, keys):
+    """Upserts a dataframe chunk on its key columns: new keys are inserted, existing keys are updated
+    only when a value changed (INSERT ... ON CONFLICT DO UPDATE ... WHERE). Returns the number of rows written."""
+    missing_keys = chunk[keys].isna().any(axis=1)
+    if missing_keys.any():
+        # NULL never conflicts in a unique index: these rows would be inserted again on every run
+        print(f"  ⚠ Skipped {int(missing_keys.sum())} row(s) with a NULL key")
+        chunk = chunk[~missing_keys]
+    chunk = chunk.drop_duplicates(subset=keys, keep="last")
+
+    cols = ", ".join(chunk.columns)
+    placeholders = ", ".join("?" * len(chunk.columns))
+    update_cols = [col for col in chunk.columns if col not in keys]
+    if update_cols:
+        set_sql = ", ".join(f"{col} = excluded.{col}" for col in update_cols)
+        changed_sql = " OR ".join(f"{full_name}.{col} IS NOT excluded.{col}" for col in update_cols)
+        conflict_sql = f"ON CONFLICT ({', '.join(keys)}) DO UPDATE SET {set_sql} WHERE {changed_sql}"
+    else:
+        conflict_sql = f"ON CONFLICT ({', '.join(keys)}) DO NOTHING"
+
+    changes_before = cursor.connection.total_changes
+    cursor.executemany(
+        f"INSERT INTO {full_name} ({cols}) VALUES ({placeholders}) {conflict_sql}",
+        fx_frame_rows(chunk)
+    )
+    return cursor.connection.total_changes - changes_before
@@ -1,11 +1,92 @@
 import sqlite3
 import os
+from contextlib import contextmanager
 
 DB_PATH = os.environ.get("DB_PATH", "/opt/airflow/data/database/DATAWAREHOUSE_ONLINE_RETAIL_II.db")
 
-def get_connection() -> sqlite3.Connection:
-    """Returns a SQLite connection with row factory enabled (rows behave like dicts)."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA journal_mode=WAL")
-    return conn
\ No newline at end of file
+# Connection settings applied by get_connection (override with environment variables)
+MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))   # bytes read through memory-mapped I/O
+CACHE_SIZE_KB = int(os.environ.get("SQLITE_CACHE_SIZE_KB", "65536"))          # page cache per connection
+TEMP_STORE = os.environ.get("SQLITE_TEMP_STORE", "DEFAULT")                   # DEFAULT, FILE or MEMORY
+BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "30000"))      # wait for a lock instead of failing
+PAGE_SIZE = int(os.environ.get("SQLITE_PAGE_SIZE", "8192"))                   # only applied when the file is created
+
+# Connections reused within a process: {(db_path, read_only): connection}
+_POOL = {}
+_POOL_PID = os.getpid()
+
+
+def _open_connection(db_path: str, read_only: bool) -> sqlite3.Connection:
+    """Opens a new connection and applies the performance settings."""
+    if read_only:
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, timeout=BUSY_TIMEOUT_MS / 1000)
+        conn.execute("PRAGMA query_only=ON")
+    else:
+        is_new = not os.path.exists(db_path) or os.path.getsize(db_path) == 0
+        conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_MS / 1000)
+        if is_new:
+            # The page size is fixed once the first page is written (and cannot change at all in WAL mode)
+            conn.execute(f"PRAGMA page_size={PAGE_SIZE}")
+        conn.execute("PRAGMA journal_mode=WAL")
+
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+    conn.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA temp_store={TEMP_STORE}")
+    return conn
+
+
+def get_connection(read_only: bool = False, db_path: str = None) -> sqlite3.Connection:
+    """Returns the tuned SQLite connection of this process, opening it on first use.
+
+    Every stage, watermark, manifest and schema registry call shares the same connection (one per
+    database path and mode), so they see each other's uncommitted writes instead of waiting on a lock.
+    read_only=True opens a separate connection that cannot write, for analytical readers.
+    A connection inherited from a parent process is never reused: each worker opens its own."""
+    global _POOL_PID
+    db_path = db_path or DB_PATH
+
+    if os.getpid() != _POOL_PID:
+        _POOL.clear()
+        _POOL_PID = os.getpid()
+
+    conn = _POOL.get((db_path, read_only))
+    if conn is not None:
+        try:
+            conn.execute("SELECT 1")
+            return conn
+        except sqlite3.ProgrammingError:
+            # Closed by its caller: open a new one
+            pass
+
+    conn = _open_connection(db_path, read_only)
+    _POOL[(db_path, read_only)] = conn
+    return conn
+
+
+def close_connections():
+    """Closes every pooled connection of this process (end of a script, tests)."""
+    for conn in _POOL.values():
+        try:
+            conn.close()
+        except sqlite3.ProgrammingError:
+            pass
+    _POOL.clear()
+
+
+@contextmanager
+def transaction(conn: sqlite3.Connection):
+    """Runs a block in one write transaction: committed at the end, rolled back on error.
+
+    Used to commit a table write and its watermark together. Inside an already open transaction,
+    the block simply joins it and the caller commits."""
+    if conn.in_transaction:
+        yield conn
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
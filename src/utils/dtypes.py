@@ -0,0 +1,56 @@
+import pandas as pd
+
+# Text columns are held as Arrow strings: one contiguous buffer per column instead of one Python object per value
+STRING_DTYPE = pd.StringDtype("pyarrow")
+
+# Low-cardinality text columns, held as categoricals (integer codes + the distinct values once)
+CATEGORICAL_COLUMNS = ("COUNTRY", "INVOICE_TYPE", "INVOICE_MONTH", "CURRENCY")
+
+# High-cardinality text columns of the sales, mapping and dimension tables
+STRING_COLUMNS = (
+    "INVOICE", "STOCKCODE", "DESCRIPTION", "DESCRIPTION_RAW", "PRODUCT_NAME",
+    "CUSTOMER_ID", "COUNTRY_RAW", "COUNTRY_STANDARDIZED", "INVOICE_DATE", "INVOICE_TIME"
+)
+
+# Labels of the INVOICE_TYPE categorical
+INVOICE_TYPES = ["RETURN", "SALE"]
+
+
+def fx_optimize_dtypes(df: pd.DataFrame, string_cols=STRING_COLUMNS, categorical_cols=CATEGORICAL_COLUMNS) -> pd.DataFrame:
+    """Converts the known text columns of a dataframe, in place, and returns it:
+    categorical_cols to categoricals, string_cols to Arrow strings.
+    Only columns holding text (object dtype read from a TEXT column) are converted: a numeric column is left as is,
+    so its values are not turned into text. Values and nulls are unchanged, only their memory layout is."""
+    for col in df.columns:
+        if not (pd.api.types.is_object_dtype(df[col]) or isinstance(df[col].dtype, pd.StringDtype)):
+            continue
+        if col in categorical_cols:
+            df[col] = df[col].astype("category")
+        elif col in string_cols:
+            df[col] = df[col].astype(STRING_DTYPE)
+    return df
+
+
+def fx_read_sql(query: str, conn, params=()) -> pd.DataFrame:
+    """pd.read_sql_query, with the text columns converted by fx_optimize_dtypes."""
+    return fx_optimize_dtypes(pd.read_sql_query(query, conn, params=params))
+
+
+def fx_date_key(dates: pd.Series) -> pd.Series:
+    """Integer date key yyyymmdd of a datetime column (nullable: NaT gives <NA>)."""
+    return (dates.dt.year * 10_000 + dates.dt.month * 100 + dates.dt.day).astype("Int64")
+
+
+def fx_epoch_seconds(dates: pd.Series) -> pd.Series:
+    """Seconds since 1970-01-01 of a naive (UTC) datetime column (nullable: NaT gives <NA>)."""
+    return ((dates - pd.Timestamp(0)) // pd.Timedelta(seconds=1)).astype("Int64")
+
+
+def fx_from_epoch(seconds: pd.Series) -> pd.Series:
+    """Datetime column back from epoch seconds, without parsing any text."""
+    return pd.to_datetime(seconds, unit="s")
+
+
+def fx_watermark_epoch(value: str | None) -> int | None:
+    """Epoch seconds of a timestamp watermark, whatever its ISO form ("YYYY-MM-DD", "... HH:MM:SS", "T" separator)."""
+    return None if value is None else int(pd.Timestamp(value).timestamp())
@@ -0,0 +1,160 @@
+import hashlib
+import os
+import posixpath
+import zipfile
+import xml.etree.ElementTree as ET
+from datetime import datetime
+
+import pandas as pd
+
+from src.utils.watermark import get_connection
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+# Workbook-wide parts that change the meaning of every sheet (shared text values, number/date formats)
+SHARED_PARTS = ("xl/sharedStrings.xml", "xl/styles.xml")
+
+NS_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+NS_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+NS_PKG_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+
+def create_manifest_table():
+    """Run once at pipeline startup to ensure the table exists."""
+    conn = get_connection()
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS _file_manifest (
+            stage           TEXT,       -- pipeline stage owning the entry
+            file_path       TEXT,
+            unit            TEXT,       -- sheet name, or '' for the whole file
+            size            INTEGER,
+            mtime           REAL,
+            fingerprint     TEXT,       -- size + content hash
+            updated_at      TEXT,
+            PRIMARY KEY (stage, file_path, unit)
+        )
+    """)
+    conn.commit()
+
+
+def get_manifest(stage: str, conn) -> dict:
+    """Returns {(file_path, unit): {"size", "mtime", "fingerprint"}} for a stage, read through the caller's connection."""
+    rows = conn.execute(
+        "SELECT file_path, unit, size, mtime, fingerprint FROM _file_manifest WHERE stage = ?",
+        (stage,)
+    ).fetchall()
+    return {
+        (file_path, unit): {"size": size, "mtime": mtime, "fingerprint": fingerprint}
+        for file_path, unit, size, mtime, fingerprint in rows
+    }
+
+
+def set_manifest_entries(stage: str, entries: list[dict], conn):
+    """Inserts or updates manifest entries (dicts with file_path, unit, size, mtime, fingerprint).
+
+    Written through the caller's connection and never committed here: the caller commits the entries
+    together with the loads they describe (see src.utils.db.transaction)."""
+    if not entries:
+        return
+    updated_at = datetime.utcnow().isoformat()
+    conn.executemany("""
+        INSERT INTO _file_manifest (stage, file_path, unit, size, mtime, fingerprint, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(stage, file_path, unit) DO UPDATE SET
+            size = excluded.size,
+            mtime = excluded.mtime,
+            fingerprint = excluded.fingerprint,
+            updated_at = excluded.updated_at
+    """, [
+        (stage, e["file_path"], e["unit"], e["size"], e["mtime"], e["fingerprint"], updated_at)
+        for e in entries
+    ])
+
+
+def file_fingerprint(file_path: str) -> str:
+    """Size plus a BLAKE2b hash of the file content, read by blocks."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return f"{os.path.getsize(file_path)}:{digest.hexdigest()}"
+
+
+def sheet_fingerprints(file_path: str) -> dict:
+    """Returns {sheet_name: fingerprint} without parsing the cells.
+
+    An xlsx file is a zip archive: each sheet is its own XML part, and the zip directory already
+    stores the size and CRC32 of every part. A sheet fingerprint combines its part with the
+    workbook-wide parts (shared strings, styles), so it only changes when the sheet content can have changed.
+    Files that are not zip archives (.xls) fall back to the whole file fingerprint for every sheet."""
+    if not zipfile.is_zipfile(file_path):
+        with pd.ExcelFile(file_path) as excel:
+            sheet_names = excel.sheet_names
+        fingerprint = file_fingerprint(file_path)
+        return {sheet: fingerprint for sheet in sheet_names}
+
+    with zipfile.ZipFile(file_path) as archive:
+        parts = {info.filename: info for info in archive.infolist()}
+        workbook = ET.fromstring(archive.read("xl/workbook.xml"))
+        relations = ET.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+
+    targets = {rel.get("Id"): rel.get("Target") for rel in relations.iter(f"{NS_PKG_REL}Relationship")}
+    shared = "|".join(
+        f"{parts[name].file_size}:{parts[name].CRC:08x}" for name in SHARED_PARTS if name in parts
+    )
+
+    fingerprints = {}
+    for sheet in workbook.iter(f"{NS_MAIN}sheet"):
+        target = targets[sheet.get(f"{NS_REL}id")]
+        part_name = target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join("xl", target))
+        info = parts[part_name]
+        digest = hashlib.blake2b(f"{info.CRC:08x}|{shared}".encode(), digest_size=16)
+        fingerprints[sheet.get("name")] = f"{info.file_size}:{digest.hexdigest()}"
+    return fingerprints
+
+
+def detect_changes(stage: str, file_paths: list[str], conn, with_sheets: bool = False) -> tuple[dict, list[dict]]:
+    """Compares files (and optionally their sheets) against the manifest of a stage.
+
+    Returns:
+        changed : {file_path: [changed sheet names]} ([] when with_sheets is False)
+        entries : the manifest entries to save once the changed units are processed
+
+    Fast path: a file whose size and mtime match the manifest is unchanged, without hashing.
+    Otherwise the file is hashed; if only its mtime moved (touch, copy, remount), nothing is reprocessed."""
+    manifest = get_manifest(stage, conn)
+    changed = {}
+    entries = []
+
+    for file_path in file_paths:
+        stat = os.stat(file_path)
+        known = manifest.get((file_path, ""))
+
+        if known and known["size"] == stat.st_size and known["mtime"] == stat.st_mtime:
+            continue
+
+        fingerprint = file_fingerprint(file_path)
+        entries.append({
+            "file_path": file_path, "unit": "", "size": stat.st_size,
+            "mtime": stat.st_mtime, "fingerprint": fingerprint
+        })
+        if known and known["fingerprint"] == fingerprint:
+            continue
+
+        if not with_sheets:
+            changed[file_path] = []
+            continue
+
+        changed_sheets = []
+        for sheet, sheet_fingerprint in sheet_fingerprints(file_path).items():
+            entries.append({
+                "file_path": file_path, "unit": sheet, "size": stat.st_size,
+                "mtime": stat.st_mtime, "fingerprint": sheet_fingerprint
+            })
+            known_sheet = manifest.get((file_path, sheet))
+            if not known_sheet or known_sheet["fingerprint"] != sheet_fingerprint:
+                changed_sheets.append(sheet)
+        if changed_sheets:
+            changed[file_path] = changed_sheets
+
+    return changed, entries
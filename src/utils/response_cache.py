@@ -0,0 +1,88 @@
+import argparse
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+# API responses are cached on disk, outside the database: a rebuilt database keeps them
+CACHE_DIR = os.environ.get("API_CACHE_DIR", "/opt/airflow/data/cache")
+CACHE_TTL_DAYS = float(os.environ.get("API_CACHE_TTL_DAYS", "30"))
+
+# Offline mode: no HTTP call at all, cached entries are used whatever their age
+API_OFFLINE = os.environ.get("API_OFFLINE", "0") == "1"
+
+
+def cache_key(value: str) -> str:
+    """Normalised cache key: surrounding spaces removed, case folded."""
+    return " ".join(str(value).split()).casefold()
+
+
+def cache_path(name: str) -> str:
+    return os.path.join(CACHE_DIR, f"{name}.json")
+
+
+def load_cache(name: str, path: str = None) -> dict:
+    """Returns the cache {key: {"value": ..., "fetched_at": ISO timestamp}}, empty if the file does not exist."""
+    path = path or cache_path(name)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_cache(name: str, cache: dict, path: str = None):
+    """Writes the cache to a temporary file then renames it: a crash never leaves a truncated cache."""
+    path = path or cache_path(name)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(cache, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def cache_get(cache: dict, key: str, ttl_days: float = None, allow_stale: bool = False):
+    """Returns the cached value of a key, or None when missing or older than the TTL (unless allow_stale)."""
+    entry = cache.get(cache_key(key))
+    if entry is None:
+        return None
+    ttl_days = CACHE_TTL_DAYS if ttl_days is None else ttl_days
+    age = datetime.now(tz=timezone.utc) - datetime.fromisoformat(entry["fetched_at"])
+    if not allow_stale and age > timedelta(days=ttl_days):
+        return None
+    return entry["value"]
+
+
+def cache_put(cache: dict, key: str, value):
+    cache[cache_key(key)] = {"value": value, "fetched_at": datetime.now(tz=timezone.utc).isoformat()}
+
+
+def export_cache(name: str, snapshot_path: str) -> int:
+    """Copies the cache to a snapshot file (e.g. to seed an air-gapped worker). Returns the number of entries."""
+    cache = load_cache(name)
+    save_cache(name, cache, path=snapshot_path)
+    return len(cache)
+
+
+def import_cache(name: str, snapshot_path: str) -> int:
+    """Merges a snapshot into the cache, the most recent entry of each key winning. Returns the number of entries taken."""
+    cache, snapshot = load_cache(name), load_cache(name, path=snapshot_path)
+    taken = {
+        key: entry for key, entry in snapshot.items()
+        if key not in cache or entry["fetched_at"] > cache[key]["fetched_at"]
+    }
+    cache.update(taken)
+    save_cache(name, cache)
+    return len(taken)
+
+
+if __name__ == "__main__":
+    # python -m src.utils.response_cache export country_metadata /path/snapshot.json
+    # python -m src.utils.response_cache import country_metadata /path/snapshot.json
+    parser = argparse.ArgumentParser(description="Export or import a snapshot of an API response cache")
+    parser.add_argument("action", choices=["export", "import"])
+    parser.add_argument("name", help="cache name, e.g. country_metadata")
+    parser.add_argument("snapshot_path")
+    args = parser.parse_args()
+    if args.action == "export":
+        print(f"Exported {export_cache(args.name, args.snapshot_path)} entries to {args.snapshot_path}")
+    else:
+        print(f"Imported {import_cache(args.name, args.snapshot_path)} entries from {args.snapshot_path}")
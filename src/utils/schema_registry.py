@@ -0,0 +1,90 @@
+import json
+from datetime import datetime
+
+from src.utils.watermark import get_connection
+
+# Explicit parse dtype for each registered SQL type, when the registry does not know the pandas dtype.
+# Nullable integers absorb nulls, so a column does not flip from INTEGER to REAL when a value goes missing.
+SQL_TYPE_PARSE_DTYPES = {"INTEGER": "Int64", "REAL": "float64"}
+
+# Explicit parse dtype for each registered pandas dtype
+PANDAS_PARSE_DTYPES = {
+    "int64": "Int64", "Int64": "Int64",
+    "float64": "float64", "Float64": "float64",
+    "bool": "boolean", "boolean": "boolean",
+    "object": "str", "string": "str"
+}
+
+
+def create_schema_registry_table():
+    """Run once at pipeline startup to ensure the tables exist."""
+    conn = get_connection()
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS _schema_registry (
+            source          TEXT PRIMARY KEY,   -- table fed by the source
+            schema          TEXT,               -- JSON {column: {"sql_type", "dtype"}}
+            updated_at      TEXT
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS _schema_drift (
+            source          TEXT,
+            column_name     TEXT,
+            registered_type TEXT,               -- NULL for a new column
+            observed_type   TEXT,               -- NULL for a missing column
+            detected_at     TEXT
+        )
+    """)
+    conn.commit()
+
+
+def get_schema(source: str, conn) -> dict | None:
+    """Returns the registered schema {column: {"sql_type", "dtype"}} of a source, or None if first run.
+    Uses the caller's connection, so it can run inside an open load transaction."""
+    row = conn.execute(
+        "SELECT schema FROM _schema_registry WHERE source = ?", (source,)
+    ).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def set_schema(source: str, schema: dict, conn):
+    """Registers (or replaces) the schema of a source, in the caller's transaction."""
+    conn.execute("""
+        INSERT INTO _schema_registry (source, schema, updated_at)
+        VALUES (?, ?, ?)
+        ON CONFLICT(source) DO UPDATE SET
+            schema = excluded.schema,
+            updated_at = excluded.updated_at
+    """, (source, json.dumps(schema), datetime.utcnow().isoformat()))
+
+
+def record_drift(source: str, drifts: list[tuple], conn):
+    """Stores the (column, registered_type, observed_type) differences found for a source."""
+    detected_at = datetime.utcnow().isoformat()
+    conn.executemany("""
+        INSERT INTO _schema_drift (source, column_name, registered_type, observed_type, detected_at)
+        VALUES (?, ?, ?, ?, ?)
+    """, [(source, col, registered, observed, detected_at) for col, registered, observed in drifts])
+
+
+def compare_schema(registered: dict, observed: dict) -> list[tuple]:
+    """Returns the (column, registered_type, observed_type) SQL type differences between two schemas."""
+    drifts = []
+    for col, entry in observed.items():
+        registered_type = registered[col]["sql_type"] if col in registered else None
+        if registered_type != entry["sql_type"]:
+            drifts.append((col, registered_type, entry["sql_type"]))
+    for col, entry in registered.items():
+        if col not in observed:
+            drifts.append((col, entry["sql_type"], None))
+    return drifts
+
+
+def parse_dtypes(schema: dict) -> dict:
+    """Returns the explicit pandas dtype to parse each registered column with ({column: dtype})."""
+    dtypes = {}
+    for col, entry in schema.items():
+        dtype = PANDAS_PARSE_DTYPES.get(entry.get("dtype")) or SQL_TYPE_PARSE_DTYPES.get(entry["sql_type"])
+        if dtype:
+            dtypes[col] = str if dtype == "str" else dtype
+    return dtypes
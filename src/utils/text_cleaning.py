@@ -0,0 +1,118 @@
+import hashlib
+import re
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from src.utils.create_table import fx_max_variables
+from src.utils.db import get_connection
+
+# Value given to missing (or non-text) values once cleaned
+FILL_VALUE = "UNKNOWN"
+
+
+def create_clean_cache_table():
+    """Run once at pipeline startup to ensure the table exists."""
+    conn = get_connection()
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS _silver_clean_cache (
+            column_name     TEXT,
+            rules_hash      TEXT,       -- cleaned values are only reused with the same rules
+            raw_value       TEXT,
+            clean_value     TEXT,
+            created_at      TEXT,
+            PRIMARY KEY (column_name, rules_hash, raw_value)
+        )
+    """)
+    conn.commit()
+
+
+def rules_hash(rules: list[tuple]) -> str:
+    """Fingerprint of a rule list: changing a rule invalidates the cached values cleaned with the old ones."""
+    return hashlib.blake2b(repr(rules).encode(), digest_size=8).hexdigest()
+
+
+def compile_rules(rules: list[tuple]):
+    """Returns a function applying the rules, in order, to one string. A rule is one of:
+        ("strip",) | ("upper",) | ("regex", pattern, replacement) | ("replace", old, new)
+    Same results as the pandas .str methods of the same names (str.strip, str.upper, re.sub, str.replace)."""
+    steps = []
+    for rule in rules:
+        if rule[0] == "strip":
+            steps.append(str.strip)
+        elif rule[0] == "upper":
+            steps.append(str.upper)
+        elif rule[0] == "regex":
+            pattern, replacement = re.compile(rule[1]), rule[2]
+            steps.append(lambda value, pattern=pattern, replacement=replacement: pattern.sub(replacement, value))
+        elif rule[0] == "replace":
+            steps.append(lambda value, old=rule[1], new=rule[2]: value.replace(old, new))
+        else:
+            raise ValueError(f"Unknown cleaning rule: {rule}")
+
+    def clean(value: str) -> str:
+        for step in steps:
+            value = step(value)
+        return value
+    return clean
+
+
+def fx_cached_values(column: str, signature: str, raw_values: list[str], conn) -> dict:
+    """Returns {raw_value: clean_value} for the given raw values already in the cache of a column and rule list.
+    Only these values are looked up (IN batches through the primary key), so the cost follows the batch,
+    not the size of the cache."""
+    cached = {}
+    batch_size = max(1, fx_max_variables(conn) - 2)
+    for start in range(0, len(raw_values), batch_size):
+        batch = raw_values[start:start + batch_size]
+        cached.update(conn.execute(
+            "SELECT raw_value, clean_value FROM _silver_clean_cache "
+            f"WHERE column_name = ? AND rules_hash = ? AND raw_value IN ({', '.join('?' * len(batch))})",
+            [column, signature, *batch]
+        ).fetchall())
+    return cached
+
+
+def fx_clean_text_column(series: pd.Series, column: str, rules: list[tuple], conn=None) -> pd.Series:
+    """Cleans a text column once per distinct value instead of once per row.
+
+    The column is factorized (codes + distinct values), the rules run on the distinct values only,
+    and the results are spread back to the rows with the codes. Missing and non-text values become FILL_VALUE.
+    With conn, cleaned values are cached in _silver_clean_cache (per column and rules): a later run only cleans
+    the values it has never seen. New cache entries are written in the caller's transaction.
+    An Arrow string column stays an Arrow string column."""
+    codes, uniques = pd.factorize(series)
+    raw_values = [value if isinstance(value, str) else None for value in uniques]
+
+    cached = {}
+    if conn is not None:
+        signature = rules_hash(rules)
+        cached = fx_cached_values(column, signature, [value for value in raw_values if value is not None], conn)
+
+    clean = compile_rules(rules)
+    new_values = {
+        value: clean(value) for value in raw_values
+        if value is not None and value not in cached
+    }
+    if conn is not None and new_values:
+        created_at = datetime.utcnow().isoformat()
+        conn.executemany("""
+            INSERT OR IGNORE INTO _silver_clean_cache (column_name, rules_hash, raw_value, clean_value, created_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, [(column, signature, raw, cleaned, created_at) for raw, cleaned in new_values.items()])
+
+    # Code -1 (missing value) takes the trailing FILL_VALUE
+    cleaned_values = [
+        FILL_VALUE if value is None else cached.get(value, new_values.get(value)) for value in raw_values
+    ] + [FILL_VALUE]
+    from_cache = sum(value in cached for value in raw_values)
+    print(f"  {column}: {len(raw_values)} distinct values for {len(series)} rows "
+          f"({len(new_values)} cleaned, {from_cache} from cache)")
+
+    dtype = series.dtype if isinstance(series.dtype, pd.StringDtype) else object
+    if dtype == object:
+        values = np.array(cleaned_values, dtype=object)[codes]
+    else:
+        values = pd.array(cleaned_values, dtype=dtype).take(codes)
+    return pd.Series(values, index=series.index, name=series.name)
@@ -1,43 +1,48 @@
-import sqlite3
-import os
 from datetime import datetime
 
-DB_PATH = os.environ.get("DB_PATH", "data/database/warehouse.db")
-
-def get_connection():
-    return sqlite3.connect(DB_PATH)
+from src.utils.db import get_connection
 
 def create_watermark_table():
     """Run once at pipeline startup to ensure the table exists."""
-    with get_connection() as conn:
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS _watermarks (
-                table_name      TEXT PRIMARY KEY,
-                last_value      TEXT,       -- timestamp OR id, stored as text
-                watermark_type  TEXT,       -- 'timestamp' or 'id'
-                updated_at      TEXT
-            )
-        """)
-        conn.commit()
+    conn = get_connection()
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS _watermarks (
+            table_name      TEXT PRIMARY KEY,
+            last_value      TEXT,       -- timestamp OR id, stored as text
+            watermark_type  TEXT,       -- 'timestamp' or 'id'
+            updated_at      TEXT
+        )
+    """)
+    conn.commit()
+
+def get_watermark(table_name: str, conn) -> str | None:
+    """Returns the last processed value for a given table, or None if first run.
+    Reads through the caller's connection (and its open transaction)."""
+    return get_watermarks([table_name], conn).get(table_name)
+
+def get_watermarks(table_names: list[str], conn) -> dict:
+    """Returns {table_name: last_value} for the tables that have a watermark, in one query.
+    Stages read all their watermarks at start with it."""
+    if not table_names:
+        return {}
+    placeholders = ", ".join("?" * len(table_names))
+    rows = conn.execute(
+        f"SELECT table_name, last_value FROM _watermarks WHERE table_name IN ({placeholders})",
+        list(table_names)
+    ).fetchall()
+    return dict(rows)
 
-def get_watermark(table_name: str) -> str | None:
-    """Returns the last processed value for a given table, or None if first run."""
-    with get_connection() as conn:
-        row = conn.execute(
-            "SELECT last_value FROM _watermarks WHERE table_name = ?",
-            (table_name,)
-        ).fetchone()
-    return row[0] if row else None
+def set_watermark(table_name: str, value: str, watermark_type: str = "timestamp", *, conn):
+    """Updates (or inserts) the watermark for a given table.
 
-def set_watermark(table_name: str, value: str, watermark_type: str = "timestamp"):
-    """Updates (or inserts) the watermark for a given table."""
-    with get_connection() as conn:
-        conn.execute("""
-            INSERT INTO _watermarks (table_name, last_value, watermark_type, updated_at)
-            VALUES (?, ?, ?, ?)
-            ON CONFLICT(table_name) DO UPDATE SET
-                last_value = excluded.last_value,
-                watermark_type = excluded.watermark_type,
-                updated_at = excluded.updated_at
-        """, (table_name, str(value), watermark_type, datetime.utcnow().isoformat()))
-        conn.commit()
\ No newline at end of file
+    The watermark is written in the caller's transaction and commits together with the data
+    it describes (see src.utils.db.transaction): a crash in between loses both, so the rerun reprocesses
+    exactly the same slice. It is never committed here."""
+    conn.execute("""
+        INSERT INTO _watermarks (table_name, last_value, watermark_type, updated_at)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(table_name) DO UPDATE SET
+            last_value = excluded.last_value,
+            watermark_type = excluded.watermark_type,
+            updated_at = excluded.updated_at
+    """, (table_name, str(value), watermark_type, datetime.utcnow().isoformat()))